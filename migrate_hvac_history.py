@@ -4,12 +4,119 @@ Database migration script to update hvac_history table schema
 Adds target_temp_heat, target_temp_cool, and fan_mode columns
 """
 
+import argparse
+import re
 import sqlite3
 import sys
 from pathlib import Path
+from typing import List, Optional
 
 
-def migrate_database(db_path: str) -> None:
+def _add_columns(cursor: sqlite3.Cursor, columns: set) -> None:
+    """Add the new columns to hvac_history in place
+    
+    The ALTER TABLE ADD COLUMNs only rewrite the schema, so they take
+    constant time regardless of table size. Backfilling the setpoints from
+    the legacy target_temp column (which is kept) is two UPDATEs that scan
+    the whole table, so that part is O(N).
+    
+    Args:
+        cursor: Cursor inside the migration transaction
+        columns: Existing hvac_history column names
+    """
+    if 'target_temp_heat' not in columns:
+        cursor.execute("ALTER TABLE hvac_history ADD COLUMN target_temp_heat REAL")
+    if 'target_temp_cool' not in columns:
+        cursor.execute("ALTER TABLE hvac_history ADD COLUMN target_temp_cool REAL")
+    if 'fan_mode' not in columns:
+        # A column default is stored in the schema, so existing rows read
+        # back as 'auto' without being rewritten
+        cursor.execute("ALTER TABLE hvac_history ADD COLUMN fan_mode TEXT DEFAULT 'auto'")
+    print("✓ Added new columns")
+    
+    if 'target_temp' in columns:
+        # Map old target_temp to the appropriate setpoint based on hvac_mode
+        cursor.execute('''
+            UPDATE hvac_history SET target_temp_heat = target_temp
+            WHERE hvac_mode IN ('heat', 'auto')
+        ''')
+        cursor.execute('''
+            UPDATE hvac_history SET target_temp_cool = target_temp
+            WHERE hvac_mode IN ('cool', 'auto')
+        ''')
+        print("✓ Mapped target temperatures to heat/cool setpoints")
+
+
+# Full table swap, run as a single script so SQLite prepares and executes
+# every statement in one call. Rows are copied in primary key order so table
+# pages fill sequentially; the timestamp index is only built once all rows
+# are loaded. Legacy target_temp is then mapped to the appropriate setpoint
+# based on hvac_mode with two joined, set-based updates.
+REBUILD_SCRIPT = '''
+    BEGIN;
+    
+    CREATE TABLE hvac_history_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        system_temp REAL,
+        target_temp_heat REAL,
+        target_temp_cool REAL,
+        hvac_mode TEXT,
+        fan_mode TEXT,
+        heat_active INTEGER,
+        cool_active INTEGER,
+        fan_active INTEGER,
+        heat2_active INTEGER,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    INSERT INTO hvac_history_new 
+        (id, system_temp, target_temp_heat, target_temp_cool, hvac_mode, fan_mode,
+         heat_active, cool_active, fan_active, heat2_active, timestamp)
+    SELECT 
+        id, system_temp, NULL, NULL, hvac_mode, 'auto',
+        heat_active, cool_active, fan_active, heat2_active, timestamp
+    FROM hvac_history
+    ORDER BY id;
+    
+    UPDATE hvac_history_new
+    SET target_temp_heat = old.target_temp
+    FROM hvac_history AS old
+    WHERE old.id = hvac_history_new.id
+      AND old.hvac_mode IN ('heat', 'auto');
+    
+    UPDATE hvac_history_new
+    SET target_temp_cool = old.target_temp
+    FROM hvac_history AS old
+    WHERE old.id = hvac_history_new.id
+      AND old.hvac_mode IN ('cool', 'auto');
+    
+    DROP TABLE hvac_history;
+    ALTER TABLE hvac_history_new RENAME TO hvac_history;
+    CREATE INDEX idx_hvac_history_timestamp ON hvac_history(timestamp);
+    
+    COMMIT;
+'''
+
+
+def _rebuild_table(conn: sqlite3.Connection) -> None:
+    """Copy hvac_history into a fresh table without the legacy target_temp column
+    
+    Args:
+        conn: Open database connection with no pending transaction
+    """
+    # Foreign key enforcement can only be switched outside a transaction and
+    # only lasts for this connection
+    conn.execute("PRAGMA foreign_keys=OFF")
+    
+    # executescript issues its own BEGIN/COMMIT, so the swap stays atomic
+    conn.executescript(REBUILD_SCRIPT)
+    
+    migrated_count = conn.execute("SELECT COUNT(*) FROM hvac_history").fetchone()[0]
+    print(f"✓ Rebuilt table with {migrated_count} HVAC history records")
+
+
+def migrate_database(db_path: str, rebuild: bool = False,
+                     pragmas: Optional[List[str]] = None) -> None:
     """Migrate hvac_history table to new schema
     
     This migration:
@@ -17,8 +124,13 @@ def migrate_database(db_path: str) -> None:
     2. Migrates existing target_temp data based on hvac_mode
     3. Preserves all existing data
     
+    By default the columns are added in place. A full table rebuild is only
+    needed to drop the legacy target_temp column.
+    
     Args:
         db_path: Path to thermostat.db
+        rebuild: Copy into a new table, dropping target_temp
+        pragmas: Extra "name=value" PRAGMAs applied after the defaults
     """
     print(f"Migrating database: {db_path}")
     
@@ -28,85 +140,39 @@ def migrate_database(db_path: str) -> None:
     
     try:
         # Check if migration is needed
-        cursor.execute("PRAGMA table_info(hvac_history)")
-        columns = [row[1] for row in cursor.fetchall()]
-        
-        if 'target_temp_heat' in columns and 'target_temp_cool' in columns:
+        cursor.execute('''
+            SELECT COUNT(*) FROM pragma_table_info('hvac_history')
+            WHERE name IN ('target_temp_heat', 'target_temp_cool')
+        ''')
+        if cursor.fetchone()[0] == 2:
             print("✓ Database already migrated")
             return
         
         print("Starting migration...")
         
-        # Begin transaction
-        conn.execute("BEGIN TRANSACTION")
-        
-        # Create new table with updated schema
-        cursor.execute('''
-            CREATE TABLE hvac_history_new (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                system_temp REAL,
-                target_temp_heat REAL,
-                target_temp_cool REAL,
-                hvac_mode TEXT,
-                fan_mode TEXT,
-                heat_active INTEGER,
-                cool_active INTEGER,
-                fan_active INTEGER,
-                heat2_active INTEGER,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        print("✓ Created new table schema")
-        
-        # Migrate data from old table
-        # For old records, map target_temp to appropriate column based on hvac_mode
-        cursor.execute('''
-            INSERT INTO hvac_history_new 
-                (id, system_temp, target_temp_heat, target_temp_cool, hvac_mode, fan_mode,
-                 heat_active, cool_active, fan_active, heat2_active, timestamp)
-            SELECT 
-                id,
-                system_temp,
-                CASE 
-                    WHEN hvac_mode = 'heat' THEN target_temp
-                    WHEN hvac_mode = 'auto' THEN target_temp
-                    ELSE NULL
-                END as target_temp_heat,
-                CASE 
-                    WHEN hvac_mode = 'cool' THEN target_temp
-                    WHEN hvac_mode = 'auto' THEN target_temp
-                    ELSE NULL
-                END as target_temp_cool,
-                hvac_mode,
-                'auto' as fan_mode,
-                heat_active,
-                cool_active,
-                fan_active,
-                heat2_active,
-                timestamp
-            FROM hvac_history
-        ''')
-        
-        migrated_count = cursor.rowcount
-        print(f"✓ Migrated {migrated_count} HVAC history records")
-        
-        # Drop old table
-        cursor.execute("DROP TABLE hvac_history")
-        print("✓ Removed old table")
-        
-        # Rename new table
-        cursor.execute("ALTER TABLE hvac_history_new RENAME TO hvac_history")
-        print("✓ Renamed new table")
-        
-        # Recreate index
-        cursor.execute('''
-            CREATE INDEX idx_hvac_history_timestamp 
-            ON hvac_history(timestamp)
-        ''')
-        print("✓ Recreated indexes")
+        # Tune the connection for bulk writes: WAL with NORMAL sync avoids an
+        # fsync per page, and a bigger page cache plus mmap lets the old
+        # table be scanned from memory
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA cache_size=-65536")  # 64 MB
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        for pragma in pragmas or []:
+            cursor.execute(f"PRAGMA {pragma}")
         
-        # Commit transaction
-        conn.commit()
+        if rebuild:
+            _rebuild_table(conn)
+        else:
+            # Begin transaction
+            conn.execute("BEGIN TRANSACTION")
+            
+            cursor.execute("SELECT name FROM pragma_table_info('hvac_history')")
+            columns = {row[0] for row in cursor.fetchall()}
+            _add_columns(cursor, columns)
+            
+            # Commit transaction
+            conn.commit()
         print("✓ Migration completed successfully!")
         
     except Exception as e:
@@ -117,31 +183,48 @@ def migrate_database(db_path: str) -> None:
         conn.close()
 
 
+def _pragma_arg(value: str) -> str:
+    """Validate a --pragma argument of the form name=value"""
+    if not re.fullmatch(r'\w+=[\w\-]+', value):
+        raise argparse.ArgumentTypeError(f"expected name=value, got '{value}'")
+    return value
+
+
 if __name__ == '__main__':
-    # Default database path
-    db_path = 'thermostat.db'
-    
-    # Allow custom path from command line
-    if len(sys.argv) > 1:
-        db_path = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Migrate hvac_history to the current schema")
+    parser.add_argument('db_path', nargs='?', default='thermostat.db',
+                        help="Path to thermostat.db (default: thermostat.db)")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="Copy into a new table, dropping the legacy target_temp column")
+    parser.add_argument('--yes', '-y', action='store_true',
+                        help="Don't ask for confirmation (for unattended runs)")
+    parser.add_argument('--pragma', action='append', type=_pragma_arg, metavar='NAME=VALUE',
+                        help="Extra PRAGMA to apply, e.g. --pragma synchronous=OFF (repeatable)")
+    args = parser.parse_args()
+    db_path = args.db_path
     
     # Check if database exists
     if not Path(db_path).exists():
         print(f"Database not found: {db_path}")
-        print("Usage: python migrate_hvac_history.py [path/to/thermostat.db]")
+        parser.print_usage()
         sys.exit(1)
     
-    # Backup recommendation
-    print("⚠️  IMPORTANT: Back up your database before running migration!")
-    print(f"   cp {db_path} {db_path}.backup")
-    response = input("\nContinue with migration? (yes/no): ")
-    
-    if response.lower() not in ['yes', 'y']:
-        print("Migration cancelled")
-        sys.exit(0)
+    if not args.yes:
+        if not sys.stdin.isatty():
+            print("Refusing to migrate without confirmation; pass --yes for unattended runs")
+            sys.exit(1)
+        
+        # Backup recommendation
+        print("⚠️  IMPORTANT: Back up your database before running migration!")
+        print(f"   cp {db_path} {db_path}.backup")
+        response = input("\nContinue with migration? (yes/no): ")
+        
+        if response.lower() not in ['yes', 'y']:
+            print("Migration cancelled")
+            sys.exit(0)
     
     try:
-        migrate_database(db_path)
+        migrate_database(db_path, rebuild=args.rebuild, pragmas=args.pragma)
     except Exception as e:
         print(f"\nMigration failed: {e}")
         sys.exit(1)
@@ -6,251 +6,483 @@ Handles settings, schedules, and history logging
 
 import sqlite3
 import logging
-from datetime import datetime, time
-from typing import List, Dict, Optional, Tuple
+import queue
+import threading
+from collections import deque
+from datetime import datetime, time, timedelta, timezone
+from time import monotonic
+from typing import Iterator, List, Dict, Optional, Tuple
 from pathlib import Path
 from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
 
+DAY_NAMES = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+# INSERT ... RETURNING needs SQLite 3.35; Raspberry Pi OS Bullseye ships 3.34
+RETURNING_SUPPORTED = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def _utc_timestamp() -> str:
+    """Current UTC time in SQLite's CURRENT_TIMESTAMP format"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _utc_cutoff(**delta) -> str:
+    """UTC time the given timedelta ago, formatted like stored timestamps
+    
+    Computed once in Python and bound as a plain parameter, so range
+    predicates compare the indexed timestamp column against a constant.
+    """
+    return (datetime.now(timezone.utc) - timedelta(**delta)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _insert_returning_id(cursor: sqlite3.Cursor, sql: str, params: tuple) -> int:
+    """Run an INSERT and return the id of the new row
+    
+    With RETURNING the id comes back from the INSERT statement itself.
+    Older SQLite falls back to lastrowid, which is equivalent as long as
+    the caller holds the connection for the whole call.
+    """
+    if RETURNING_SUPPORTED:
+        cursor.execute(sql + ' RETURNING id', params)
+        return cursor.fetchone()[0]
+    cursor.execute(sql, params)
+    return cursor.lastrowid
+
+
+def parse_days_of_week(days_of_week: str) -> List[int]:
+    """Parse a schedule's days_of_week string into weekday numbers
+    
+    Args:
+        days_of_week: Comma-separated day names ("Mon,Tue" or "Monday") or
+            numbers 0-6, where 0 is Monday
+    
+    Returns:
+        Sorted list of unique weekday numbers (0=Monday ... 6=Sunday)
+    """
+    days = set()
+    for token in (days_of_week or '').split(','):
+        token = token.strip().lower()
+        if token.isdigit() and int(token) < 7:
+            days.add(int(token))
+        elif token[:3] in DAY_NAMES:
+            days.add(DAY_NAMES.index(token[:3]))
+        elif token:
+            logger.warning(f"Ignoring unrecognized schedule day: {token!r}")
+    return sorted(days)
+
+
+def days_of_week_mask(days_of_week: str) -> int:
+    """Encode a schedule's days_of_week string as a 7-bit weekday mask
+    
+    Args:
+        days_of_week: Days in any form parse_days_of_week() accepts
+    
+    Returns:
+        Bitmask with bit n set for weekday n (bit 0 = Monday)
+    """
+    mask = 0
+    for day in parse_days_of_week(days_of_week):
+        mask |= 1 << day
+    return mask
+
+
 class ThermostatDatabase:
     """Manages SQLite database for thermostat data"""
     
-    def __init__(self, db_path: str = 'thermostat.db'):
+    # Connection-scoped tuning applied to every new connection. Sized for a
+    # Raspberry Pi: NORMAL sync is safe in WAL mode and avoids an fsync per
+    # commit; cache and mmap are kept modest to suit 32-bit, low-RAM boards.
+    # (busy timeout is already 5s via sqlite3.connect's default timeout)
+    CONNECTION_PRAGMAS = (
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA temp_store=MEMORY',
+        'PRAGMA cache_size=-16000',  # 16 MB
+        'PRAGMA mmap_size=67108864',  # 64 MB
+    )
+    
+    # Read-only connections kept open for queries, on top of the writer
+    READER_POOL_SIZE = 2
+    
+    # History writes are buffered and committed together: as soon as this
+    # many rows are pending, or after this many seconds
+    WRITE_BATCH_SIZE = 50
+    WRITE_FLUSH_INTERVAL = 5.0
+    
+    # An unchanged HVAC state is logged at most once per this many seconds.
+    # The thermostat logs every HISTORY_LOG_INTERVAL (5 minutes by default),
+    # so an idle system writes one row per half hour instead of six.
+    HVAC_HEARTBEAT_INTERVAL = 1800.0
+    
+    # Old history is purged in transactions of at most this many rows, and
+    # the freed pages handed back this many at a time
+    CLEANUP_BATCH_SIZE = 10000
+    VACUUM_BATCH_PAGES = 1000
+    
+    # idx_sensor_history_timestamp columns: timestamp first for range scans
+    # and cleanup, then the rest of what get_sensor_history() returns
+    _SENSOR_TIMESTAMP_INDEX_COLUMNS = 'timestamp, sensor_id, sensor_name, temperature, is_compromised'
+    
+    # Bump when _upgrade_schema() gains a step; stored in PRAGMA user_version
+    SCHEMA_VERSION = 2
+    
+    # Tables whose row counts are maintained by triggers in table_counts
+    COUNTED_TABLES = ('setting_history', 'sensor_history', 'hvac_history')
+    
+    # Full schema, applied as one script in a single transaction when the
+    # database is below SCHEMA_VERSION. Every statement is IF NOT EXISTS, so
+    # it is safe to re-run on a partially initialized file.
+    _SCHEMA_SQL = f'''
+    BEGIN;
+    
+    -- Settings table - current thermostat settings
+    CREATE TABLE IF NOT EXISTS settings (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        target_temp_heat REAL NOT NULL,
+        target_temp_cool REAL NOT NULL,
+        hvac_mode TEXT NOT NULL,
+        fan_mode TEXT DEFAULT 'auto',
+        temperature_units TEXT DEFAULT 'F',
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    -- Schedules table - time-based temperature programs
+    CREATE TABLE IF NOT EXISTS schedules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        enabled INTEGER DEFAULT 1,
+        days_of_week TEXT NOT NULL,
+        time TEXT NOT NULL,
+        target_temp_heat REAL,
+        target_temp_cool REAL,
+        hvac_mode TEXT,
+        days_mask INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    -- Sensors table - sensor configuration and labels
+    CREATE TABLE IF NOT EXISTS sensors (
+        sensor_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        enabled INTEGER DEFAULT 1,
+        monitored INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    -- Setting history - audit log of setting changes
+    CREATE TABLE IF NOT EXISTS setting_history (
+        id INTEGER PRIMARY KEY,
+        setting_name TEXT NOT NULL,
+        old_value TEXT,
+        new_value TEXT NOT NULL,
+        source TEXT NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    -- Sensor history - temperature readings over time
+    CREATE TABLE IF NOT EXISTS sensor_history (
+        id INTEGER PRIMARY KEY,
+        sensor_id TEXT NOT NULL,
+        sensor_name TEXT NOT NULL,
+        temperature REAL NOT NULL,
+        is_compromised INTEGER DEFAULT 0,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    -- HVAC Stages - configurable heating/cooling stages
+    CREATE TABLE IF NOT EXISTS hvac_stages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        stage_type TEXT NOT NULL,
+        stage_number INTEGER NOT NULL,
+        gpio_pin INTEGER NOT NULL,
+        temp_offset REAL NOT NULL,
+        min_run_time INTEGER DEFAULT 300,
+        enabled INTEGER DEFAULT 1,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(stage_type, stage_number)
+    );
+    
+    -- HVAC history - track when HVAC runs
+    CREATE TABLE IF NOT EXISTS hvac_history (
+        id INTEGER PRIMARY KEY,
+        system_temp REAL,
+        target_temp_heat REAL,
+        target_temp_cool REAL,
+        hvac_mode TEXT,
+        fan_mode TEXT,
+        heat_active INTEGER,
+        cool_active INTEGER,
+        fan_active INTEGER,
+        heat2_active INTEGER,
+        active_stages TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    -- Row counts of the history tables, kept current by triggers
+    -- (see _upgrade_schema and _create_count_triggers) so stats don't
+    -- have to scan them
+    CREATE TABLE IF NOT EXISTS table_counts (
+        name TEXT PRIMARY KEY,
+        n INTEGER NOT NULL DEFAULT 0
+    );
+    
+    -- Create indexes for performance. Both sensor_history indexes
+    -- cover every column history reads return, so the all-sensors
+    -- and per-sensor queries are answered without touching the table.
+    CREATE INDEX IF NOT EXISTS idx_sensor_history_timestamp
+    ON sensor_history({_SENSOR_TIMESTAMP_INDEX_COLUMNS});
+    CREATE INDEX IF NOT EXISTS idx_sensor_history_cover
+    ON sensor_history(sensor_id, timestamp, sensor_name, temperature, is_compromised);
+    CREATE INDEX IF NOT EXISTS idx_setting_history_timestamp
+    ON setting_history(timestamp);
+    CREATE INDEX IF NOT EXISTS idx_hvac_history_timestamp
+    ON hvac_history(timestamp);
+    CREATE INDEX IF NOT EXISTS idx_schedules_active
+    ON schedules(enabled, time);
+    CREATE INDEX IF NOT EXISTS idx_hvac_stages_type_enabled
+    ON hvac_stages(stage_type, enabled, stage_number);
+    
+    COMMIT;
+'''
+    
+    # Size of each connection's prepared statement cache (the default is
+    # 128), so the hot INSERTs below are never evicted by ad-hoc queries
+    STATEMENT_CACHE_SIZE = 256
+    
+    # Hot-path statements. The statement cache is keyed on the SQL text, so
+    # keeping one copy of each avoids re-parsing them on every write.
+    _SQL_INSERT_SENSOR = '''
+        INSERT INTO sensor_history (sensor_id, sensor_name, temperature, 
+                                    is_compromised, timestamp)
+        VALUES (?, ?, ?, ?, ?)
+    '''
+    _SQL_INSERT_HVAC = '''
+        INSERT INTO hvac_history (system_temp, target_temp_heat, target_temp_cool, 
+                                hvac_mode, fan_mode, heat_active, cool_active, 
+                                fan_active, heat2_active, active_stages, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    _SQL_INSERT_SETTING_CHANGE = '''
+        INSERT INTO setting_history (setting_name, old_value, new_value, source)
+        VALUES (?, ?, ?, ?)
+    '''
+    
+    _SQL_INSERT_SCHEDULE = '''
+        INSERT INTO schedules (name, days_of_week, time, target_temp_heat, 
+                               target_temp_cool, hvac_mode, days_mask)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    '''
+    
+    # Columns update_schedule() may change, in the order of its statement
+    _SCHEDULE_FIELDS = ('name', 'enabled', 'days_of_week', 'time',
+                        'target_temp_heat', 'target_temp_cool', 'hvac_mode')
+    _SQL_UPDATE_SCHEDULE = '''
+        UPDATE schedules SET
+            name = CASE WHEN ? THEN ? ELSE name END,
+            enabled = CASE WHEN ? THEN ? ELSE enabled END,
+            days_of_week = CASE WHEN ? THEN ? ELSE days_of_week END,
+            time = CASE WHEN ? THEN ? ELSE time END,
+            target_temp_heat = CASE WHEN ? THEN ? ELSE target_temp_heat END,
+            target_temp_cool = CASE WHEN ? THEN ? ELSE target_temp_cool END,
+            hvac_mode = CASE WHEN ? THEN ? ELSE hvac_mode END,
+            days_mask = CASE WHEN ? THEN ? ELSE days_mask END,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    '''
+    
+    def __init__(self, db_path: str = 'thermostat.db',
+                 write_flush_interval: Optional[float] = None):
         self.db_path = db_path
+        # Longer intervals commit several history logs per transaction, at
+        # the cost of losing more on a power cut
+        if write_flush_interval is not None:
+            self.WRITE_FLUSH_INTERVAL = write_flush_interval
+        # Paths are fixed for the lifetime of the instance; built once for
+        # the size checks in stats and cleanup
+        self._db_file = Path(db_path)
+        self._wal_file = Path(f"{db_path}-wal")
+        
+        # In-memory caches for rows that are read every control loop but
+        # change rarely. Schedule cache entries are tagged with the version
+        # they were read at, which every schedule write bumps.
+        self._cache_lock = threading.Lock()
+        self._settings_cache: Optional[Dict] = None
+        self._schedules_cache: Dict[bool, Tuple[int, List[Dict]]] = {}
+        self._schedules_version = 0
+        self._sensor_names: Optional[Dict[str, str]] = None
+        
+        # One long-lived connection for all writes, shared by all threads
+        # and serialized by the lock
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        
+        # Pool of read-only connections, opened on demand up to
+        # READER_POOL_SIZE. WAL lets them read while the writer is busy, so
+        # web interface queries don't wait behind the control loop.
+        self._readers: queue.LifoQueue = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        
+        # Pending sensor_history / hvac_history rows, written by flush(). A
+        # one-shot timer is armed only while rows are waiting.
+        self._sensor_queue: deque = deque()
+        self._hvac_queue: deque = deque()
+        self._flush_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        
+        # Last HVAC state queued by log_hvac_state() and when, so repeats of
+        # an idle state between heartbeats are dropped
+        self._last_hvac_state: Optional[tuple] = None
+        self._last_hvac_logged = 0.0
+        
         self._init_database()
         self._migrate_schema()  # Auto-migrate on initialization
     
     @contextmanager
     def _get_connection(self):
-        """Context manager for database connections"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """Context manager for the shared database connection
+        
+        Holds the connection lock for the duration of the block, commits on
+        success and rolls back on error.
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                yield conn
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Database error: {e}")
+                raise
+    
+    @contextmanager
+    def _reader(self):
+        """Context manager lending a read-only connection from the pool
+        
+        For queries only; writes go through _get_connection().
+        """
+        conn = self._acquire_reader()
         try:
             yield conn
-            conn.commit()
         except Exception as e:
-            conn.rollback()
             logger.error(f"Database error: {e}")
             raise
         finally:
-            conn.close()
+            self._readers.put(conn)
+    
+    def _acquire_reader(self) -> sqlite3.Connection:
+        """Take an idle reader, opening a new one while the pool has room"""
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._reader_lock:
+            if self._reader_count < self.READER_POOL_SIZE:
+                self._reader_count += 1
+                return self._open_reader()
+        return self._readers.get()
+    
+    def _open_reader(self) -> sqlite3.Connection:
+        """Open a read-only connection with the tuning PRAGMAs applied"""
+        uri = f"{self._db_file.resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               cached_statements=self.STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Get the shared connection, opening it on first use"""
+        if self._conn is None:
+            # Write transactions open with BEGIN IMMEDIATE, so the write lock
+            # (and any wait for it, up to the busy timeout) is taken at BEGIN
+            # rather than partway through a transaction
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   cached_statements=self.STATEMENT_CACHE_SIZE,
+                                   isolation_level='IMMEDIATE')
+            conn.row_factory = sqlite3.Row
+            self._configure_connection(conn)
+            self._conn = conn
+        return self._conn
+    
+    def _configure_connection(self, conn: sqlite3.Connection) -> None:
+        """Apply journal mode and tuning PRAGMAs to a new connection"""
+        # Must come before anything writes the header: new databases are
+        # created with incremental auto_vacuum, existing ones switch over at
+        # their next VACUUM (see smart_cleanup)
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('PRAGMA journal_mode=WAL')
+        for pragma in self.CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+    
+    def close(self) -> None:
+        """Write pending history and close the writer and idle readers
+        
+        The next database call transparently reopens them.
+        """
+        self.flush()
+        with self._reader_lock:
+            while True:
+                try:
+                    self._readers.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._reader_count -= 1
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    def _database_size(self) -> int:
+        """Get the on-disk size of the database in bytes, including its WAL"""
+        size = 0
+        for path in (self._db_file, self._wal_file):
+            try:
+                size += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return size
     
     def _init_database(self) -> None:
-        """Initialize database schema"""
+        """Initialize database schema
+        
+        A database already at SCHEMA_VERSION has every table and index, so
+        the DDL is only run for new or older files.
+        """
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Settings table - current thermostat settings
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS settings (
-                    id INTEGER PRIMARY KEY CHECK (id = 1),
-                    target_temp_heat REAL NOT NULL,
-                    target_temp_cool REAL NOT NULL,
-                    hvac_mode TEXT NOT NULL,
-                    fan_mode TEXT DEFAULT 'auto',
-                    temperature_units TEXT DEFAULT 'F',
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Schedules table - time-based temperature programs
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS schedules (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    enabled INTEGER DEFAULT 1,
-                    days_of_week TEXT NOT NULL,
-                    time TEXT NOT NULL,
-                    target_temp_heat REAL,
-                    target_temp_cool REAL,
-                    hvac_mode TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Sensors table - sensor configuration and labels
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS sensors (
-                    sensor_id TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    enabled INTEGER DEFAULT 1,
-                    monitored INTEGER DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Setting history - audit log of setting changes
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS setting_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    setting_name TEXT NOT NULL,
-                    old_value TEXT,
-                    new_value TEXT NOT NULL,
-                    source TEXT NOT NULL,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Sensor history - temperature readings over time
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS sensor_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sensor_id TEXT NOT NULL,
-                    sensor_name TEXT NOT NULL,
-                    temperature REAL NOT NULL,
-                    is_compromised INTEGER DEFAULT 0,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # HVAC Stages - configurable heating/cooling stages
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS hvac_stages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    stage_type TEXT NOT NULL,
-                    stage_number INTEGER NOT NULL,
-                    gpio_pin INTEGER NOT NULL,
-                    temp_offset REAL NOT NULL,
-                    min_run_time INTEGER DEFAULT 300,
-                    enabled INTEGER DEFAULT 1,
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(stage_type, stage_number)
-                )
-            ''')
-            
-            # HVAC history - track when HVAC runs
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS hvac_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    system_temp REAL,
-                    target_temp_heat REAL,
-                    target_temp_cool REAL,
-                    hvac_mode TEXT,
-                    fan_mode TEXT,
-                    heat_active INTEGER,
-                    cool_active INTEGER,
-                    fan_active INTEGER,
-                    heat2_active INTEGER,
-                    active_stages TEXT,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Create indexes for performance
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_sensor_history_timestamp 
-                ON sensor_history(timestamp)
-            ''')
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_sensor_history_sensor_id 
-                ON sensor_history(sensor_id, timestamp)
-            ''')
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_setting_history_timestamp 
-                ON setting_history(timestamp)
-            ''')
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_hvac_history_timestamp 
-                ON hvac_history(timestamp)
-            ''')
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_schedules_enabled 
-                ON schedules(enabled, days_of_week, time)
-            ''')
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_hvac_stages_type_enabled 
-                ON hvac_stages(stage_type, enabled, stage_number)
-            ''')
-            
+            if conn.execute('PRAGMA user_version').fetchone()[0] < self.SCHEMA_VERSION:
+                # executescript commits the writer's pending transaction
+                # first, then runs the script's own BEGIN/COMMIT
+                conn.executescript(self._SCHEMA_SQL)
             logger.info(f"Database initialized at {self.db_path}")
     
     def _migrate_schema(self) -> None:
-        """Apply schema migrations for database upgrades"""
+        """Apply schema migrations for database upgrades
+        
+        PRAGMA user_version records the schema version a database has been
+        upgraded to, so once it is current startup skips the per-table
+        checks entirely.
+        """
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
-            # Migration: Add target_temp_heat, target_temp_cool, fan_mode to hvac_history
-            cursor.execute("PRAGMA table_info(hvac_history)")
-            columns = [row[1] for row in cursor.fetchall()]
-            
-            if 'target_temp_heat' not in columns or 'target_temp_cool' not in columns:
-                logger.info("Migrating hvac_history table schema...")
-                
-                try:
-                    # Create new table with updated schema
-                    cursor.execute('''
-                        CREATE TABLE hvac_history_new (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            system_temp REAL,
-                            target_temp_heat REAL,
-                            target_temp_cool REAL,
-                            hvac_mode TEXT,
-                            fan_mode TEXT,
-                            heat_active INTEGER,
-                            cool_active INTEGER,
-                            fan_active INTEGER,
-                            heat2_active INTEGER,
-                            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                        )
-                    ''')
-                    
-                    # Migrate data from old table (handle legacy target_temp field)
-                    cursor.execute('''
-                        INSERT INTO hvac_history_new 
-                            (id, system_temp, target_temp_heat, target_temp_cool, hvac_mode, fan_mode,
-                             heat_active, cool_active, fan_active, heat2_active, timestamp)
-                        SELECT 
-                            id,
-                            system_temp,
-                            CASE 
-                                WHEN hvac_mode = 'heat' THEN target_temp
-                                WHEN hvac_mode = 'auto' THEN target_temp
-                                ELSE NULL
-                            END as target_temp_heat,
-                            CASE 
-                                WHEN hvac_mode = 'cool' THEN target_temp
-                                WHEN hvac_mode = 'auto' THEN target_temp
-                                ELSE NULL
-                            END as target_temp_cool,
-                            hvac_mode,
-                            'auto' as fan_mode,
-                            heat_active,
-                            cool_active,
-                            fan_active,
-                            heat2_active,
-                            timestamp
-                        FROM hvac_history
-                    ''')
-                    
-                    # Drop old table and rename new one
-                    cursor.execute("DROP TABLE hvac_history")
-                    cursor.execute("ALTER TABLE hvac_history_new RENAME TO hvac_history")
-                    
-                    # Recreate index
-                    cursor.execute('''
-                        CREATE INDEX idx_hvac_history_timestamp 
-                        ON hvac_history(timestamp)
-                    ''')
-                    
-                    logger.info("✓ hvac_history table migration completed")
-                except Exception as e:
-                    logger.error(f"Schema migration failed: {e}")
-                    raise
-            
-            # Migration: Add active_stages column to hvac_history
-            cursor.execute("PRAGMA table_info(hvac_history)")
-            columns = [row[1] for row in cursor.fetchall()]
-            
-            if 'active_stages' not in columns:
-                logger.info("Adding active_stages column to hvac_history...")
-                cursor.execute('ALTER TABLE hvac_history ADD COLUMN active_stages TEXT')
-                logger.info("✓ active_stages column added")
+            cursor.execute('PRAGMA user_version')
+            if cursor.fetchone()[0] < self.SCHEMA_VERSION:
+                # sqlite3 only opens a transaction implicitly at the first
+                # DML statement, so begin one explicitly: the DDL, the table
+                # copies and the version bump then commit or roll back
+                # together, and an interrupted upgrade is simply rerun
+                cursor.execute('BEGIN IMMEDIATE')
+                self._upgrade_schema(cursor)
+                cursor.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
             
             # Migration: Create default heating stages from config if hvac_stages is empty
             cursor.execute('SELECT COUNT(*) FROM hvac_stages')
@@ -278,43 +510,264 @@ class ThermostatDatabase:
                 ''')
                 logger.info("✓ Default HVAC stages created")
     
+    def _upgrade_schema(self, cursor: sqlite3.Cursor) -> None:
+        """Bring an older database up to SCHEMA_VERSION
+        
+        Each step checks for itself whether it is needed, so this is safe
+        to run on a database at any earlier version.
+        
+        Args:
+            cursor: Cursor inside the migration transaction
+        """
+        # Migration: Add target_temp_heat, target_temp_cool, fan_mode to hvac_history
+        cursor.execute('''
+            SELECT COUNT(*) FROM pragma_table_info('hvac_history')
+            WHERE name IN ('target_temp_heat', 'target_temp_cool')
+        ''')
+        
+        if cursor.fetchone()[0] < 2:
+            logger.info("Migrating hvac_history table schema...")
+            
+            try:
+                # Create new table with updated schema
+                cursor.execute('''
+                    CREATE TABLE hvac_history_new (
+                        id INTEGER PRIMARY KEY,
+                        system_temp REAL,
+                        target_temp_heat REAL,
+                        target_temp_cool REAL,
+                        hvac_mode TEXT,
+                        fan_mode TEXT,
+                        heat_active INTEGER,
+                        cool_active INTEGER,
+                        fan_active INTEGER,
+                        heat2_active INTEGER,
+                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                # Migrate data from old table (handle legacy target_temp field)
+                cursor.execute('''
+                    INSERT INTO hvac_history_new 
+                        (id, system_temp, target_temp_heat, target_temp_cool, hvac_mode, fan_mode,
+                         heat_active, cool_active, fan_active, heat2_active, timestamp)
+                    SELECT 
+                        id,
+                        system_temp,
+                        CASE 
+                            WHEN hvac_mode = 'heat' THEN target_temp
+                            WHEN hvac_mode = 'auto' THEN target_temp
+                            ELSE NULL
+                        END as target_temp_heat,
+                        CASE 
+                            WHEN hvac_mode = 'cool' THEN target_temp
+                            WHEN hvac_mode = 'auto' THEN target_temp
+                            ELSE NULL
+                        END as target_temp_cool,
+                        hvac_mode,
+                        'auto' as fan_mode,
+                        heat_active,
+                        cool_active,
+                        fan_active,
+                        heat2_active,
+                        timestamp
+                    FROM hvac_history
+                ''')
+                
+                # Drop old table and rename new one
+                cursor.execute("DROP TABLE hvac_history")
+                cursor.execute("ALTER TABLE hvac_history_new RENAME TO hvac_history")
+                
+                # Recreate index
+                cursor.execute('''
+                    CREATE INDEX idx_hvac_history_timestamp 
+                    ON hvac_history(timestamp)
+                ''')
+                
+                logger.info("✓ hvac_history table migration completed")
+            except Exception as e:
+                logger.error(f"Schema migration failed: {e}")
+                raise
+        
+        # Migration: Add active_stages column to hvac_history
+        cursor.execute('''
+            SELECT 1 FROM pragma_table_info('hvac_history')
+            WHERE name = 'active_stages'
+        ''')
+        
+        if cursor.fetchone() is None:
+            logger.info("Adding active_stages column to hvac_history...")
+            cursor.execute('ALTER TABLE hvac_history ADD COLUMN active_stages TEXT')
+            logger.info("✓ active_stages column added")
+        
+        # Migration: The covering indexes above supersede the narrow ones
+        cursor.execute('DROP INDEX IF EXISTS idx_sensor_history_sensor_id')
+        cursor.execute('''
+            SELECT COUNT(*) FROM pragma_index_info('idx_sensor_history_timestamp')
+        ''')
+        if cursor.fetchone()[0] == 1:
+            logger.info("Rebuilding idx_sensor_history_timestamp as a covering index...")
+            cursor.execute('DROP INDEX idx_sensor_history_timestamp')
+            cursor.execute(f'''
+                CREATE INDEX idx_sensor_history_timestamp 
+                ON sensor_history({self._SENSOR_TIMESTAMP_INDEX_COLUMNS})
+            ''')
+        
+        # Migration: Add days_mask to schedules, replacing the
+        # schedule_days table and the old days_of_week index
+        cursor.execute('''
+            SELECT 1 FROM pragma_table_info('schedules')
+            WHERE name = 'days_mask'
+        ''')
+        if cursor.fetchone() is None:
+            logger.info("Adding days_mask column to schedules...")
+            cursor.execute('ALTER TABLE schedules ADD COLUMN days_mask INTEGER NOT NULL DEFAULT 0')
+        cursor.execute('DROP TABLE IF EXISTS schedule_days')
+        cursor.execute('DROP INDEX IF EXISTS idx_schedules_enabled')
+        
+        # Schedules written before the column existed still have an
+        # empty mask
+        cursor.execute('SELECT id, days_of_week FROM schedules WHERE days_mask = 0')
+        cursor.executemany(
+            'UPDATE schedules SET days_mask = ? WHERE id = ?',
+            [(days_of_week_mask(row['days_of_week']), row['id']) for row in cursor.fetchall()]
+        )
+        
+        # Migration: History ids no longer use AUTOINCREMENT, which updates
+        # sqlite_sequence on every insert. Removing it takes a table copy.
+        for table in self.COUNTED_TABLES:
+            cursor.execute('''
+                SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?
+            ''', (table,))
+            table_sql = cursor.fetchone()[0]
+            if 'AUTOINCREMENT' in table_sql:
+                logger.info(f"Rebuilding {table} without AUTOINCREMENT...")
+                self._rebuild_table(cursor, table, table_sql.replace(' AUTOINCREMENT', ''))
+        
+        # Migration: Row count triggers. Dropping a table drops its
+        # triggers, so a rebuilt table is recounted once here.
+        for table in self.COUNTED_TABLES:
+            cursor.execute('''
+                SELECT 1 FROM sqlite_master
+                WHERE type = 'trigger' AND name = ?
+            ''', (f'{table}_count_insert',))
+            if cursor.fetchone() is None:
+                self._create_count_triggers(cursor, table)
+    
+    @staticmethod
+    def _rebuild_table(cursor: sqlite3.Cursor, table: str, table_sql: str) -> None:
+        """Copy a table into a new definition with the same columns
+        
+        Rows keep their ids and the table's indexes are recreated; its
+        triggers are dropped with the old table.
+        
+        Args:
+            cursor: Cursor inside the migration transaction
+            table: Table to rebuild
+            table_sql: CREATE TABLE statement for the new definition
+        """
+        cursor.execute('''
+            SELECT sql FROM sqlite_master
+            WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL
+        ''', (table,))
+        index_sqls = [row[0] for row in cursor.fetchall()]
+        
+        cursor.execute(table_sql.replace(table, f'{table}_new', 1))
+        cursor.execute(f'INSERT INTO {table}_new SELECT * FROM {table} ORDER BY id')
+        cursor.execute(f'DROP TABLE {table}')
+        cursor.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+        for index_sql in index_sqls:
+            cursor.execute(index_sql)
+    
+    @staticmethod
+    def _create_count_triggers(cursor: sqlite3.Cursor, table: str) -> None:
+        """Seed the row count of a history table and keep it current
+        
+        Args:
+            cursor: Cursor inside the migration transaction
+            table: History table to count
+        """
+        cursor.execute(f'''
+            INSERT OR REPLACE INTO table_counts (name, n)
+            SELECT ?, COUNT(*) FROM {table}
+        ''', (table,))
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_count_insert
+            AFTER INSERT ON {table}
+            BEGIN
+                UPDATE table_counts SET n = n + 1 WHERE name = '{table}';
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_count_delete
+            AFTER DELETE ON {table}
+            BEGIN
+                UPDATE table_counts SET n = n - 1 WHERE name = '{table}';
+            END
+        ''')
+    
     # ==================== SETTINGS ====================
     
     def save_settings(self, target_temp_heat: float, target_temp_cool: float, 
                      hvac_mode: str, fan_mode: str = 'auto', 
                      temperature_units: str = 'F') -> None:
         """Save current thermostat settings"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT OR REPLACE INTO settings (id, target_temp_heat, target_temp_cool, 
-                                                hvac_mode, fan_mode, temperature_units, updated_at)
-                VALUES (1, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (target_temp_heat, target_temp_cool, hvac_mode, fan_mode, temperature_units))
-            logger.debug(f"Settings saved: heat={target_temp_heat}, cool={target_temp_cool}, mode={hvac_mode}, units={temperature_units}")
+        with self._cache_lock:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO settings (id, target_temp_heat, target_temp_cool, 
+                                                    hvac_mode, fan_mode, temperature_units, updated_at)
+                    VALUES (1, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (target_temp_heat, target_temp_cool, hvac_mode, fan_mode, temperature_units))
+            
+            # Keep the cache in step with what was written (CURRENT_TIMESTAMP is UTC)
+            self._settings_cache = {
+                'target_temp_heat': target_temp_heat,
+                'target_temp_cool': target_temp_cool,
+                'hvac_mode': hvac_mode,
+                'fan_mode': fan_mode,
+                'temperature_units': temperature_units,
+                'updated_at': _utc_timestamp()
+            }
+            logger.debug("Settings saved: heat=%s, cool=%s, mode=%s, units=%s",
+                         target_temp_heat, target_temp_cool, hvac_mode, temperature_units)
     
     def load_settings(self) -> Optional[Dict]:
-        """Load current thermostat settings"""
-        with self._get_connection() as conn:
+        """Load current thermostat settings
+        
+        Served from memory after the first read; the cache is refreshed by
+        save_settings() and cleared by invalidate_settings_cache().
+        """
+        with self._cache_lock:
+            if self._settings_cache is None:
+                self._settings_cache = self._read_settings()
+            
+            if self._settings_cache is None:
+                return None
+            return dict(self._settings_cache)
+    
+    def invalidate_settings_cache(self) -> None:
+        """Drop cached settings so the next load_settings() reads the database
+        
+        Call this after modifying the settings table outside this instance.
+        """
+        with self._cache_lock:
+            self._settings_cache = None
+    
+    def _read_settings(self) -> Optional[Dict]:
+        """Read current thermostat settings from the database"""
+        with self._reader() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM settings WHERE id = 1')
             row = cursor.fetchone()
             
             if row:
+                settings = dict(row)
+                del settings['id']
                 # Handle temperature_units column that might not exist in old databases
-                try:
-                    temperature_units = row['temperature_units']
-                except (KeyError, IndexError):
-                    temperature_units = 'F'
-                
-                return {
-                    'target_temp_heat': row['target_temp_heat'],
-                    'target_temp_cool': row['target_temp_cool'],
-                    'hvac_mode': row['hvac_mode'],
-                    'fan_mode': row['fan_mode'],
-                    'temperature_units': temperature_units,
-                    'updated_at': row['updated_at']
-                }
+                settings.setdefault('temperature_units', 'F')
+                return settings
             return None
     
     # ==================== SENSORS ====================
@@ -329,28 +782,21 @@ class ThermostatDatabase:
                 VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
             ''', (sensor_id, name, int(enabled), int(monitored)))
             logger.debug(f"Sensor added/updated: {sensor_id} -> {name} (enabled={enabled}, monitored={monitored})")
+        
+        self.invalidate_sensor_names_cache()
     
     def get_sensor(self, sensor_id: str) -> Optional[Dict]:
         """Get a single sensor by ID"""
-        with self._get_connection() as conn:
+        with self._reader() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM sensors WHERE sensor_id = ?', (sensor_id,))
             row = cursor.fetchone()
             
-            if row:
-                return {
-                    'sensor_id': row['sensor_id'],
-                    'name': row['name'],
-                    'enabled': bool(row['enabled']),
-                    'monitored': bool(row['monitored']),
-                    'created_at': row['created_at'],
-                    'updated_at': row['updated_at']
-                }
-            return None
+            return self._sensor_from_row(row) if row else None
     
     def get_sensors(self, enabled_only: bool = False) -> List[Dict]:
         """Get all sensors from the database"""
-        with self._get_connection() as conn:
+        with self._reader() as conn:
             cursor = conn.cursor()
             
             if enabled_only:
@@ -358,20 +804,15 @@ class ThermostatDatabase:
             else:
                 cursor.execute('SELECT * FROM sensors ORDER BY name')
             
-            rows = cursor.fetchall()
-            sensors = []
-            
-            for row in rows:
-                sensors.append({
-                    'sensor_id': row['sensor_id'],
-                    'name': row['name'],
-                    'enabled': bool(row['enabled']),
-                    'monitored': bool(row['monitored']),
-                    'created_at': row['created_at'],
-                    'updated_at': row['updated_at']
-                })
-            
-            return sensors
+            return [self._sensor_from_row(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def _sensor_from_row(row: sqlite3.Row) -> Dict:
+        """Build a sensor dict, with the stored 0/1 flags as booleans"""
+        sensor = dict(row)
+        sensor['enabled'] = bool(sensor['enabled'])
+        sensor['monitored'] = bool(sensor['monitored'])
+        return sensor
     
     def update_sensor(self, sensor_id: str, name: str = None, 
                      enabled: bool = None, monitored: bool = None) -> bool:
@@ -403,22 +844,42 @@ class ThermostatDatabase:
             
             query = f"UPDATE sensors SET {', '.join(updates)} WHERE sensor_id = ?"
             cursor.execute(query, params)
-            
-            if cursor.rowcount > 0:
-                logger.debug(f"Sensor updated: {sensor_id}")
-                return True
-            return False
+            updated = cursor.rowcount > 0
+        
+        if updated:
+            logger.debug(f"Sensor updated: {sensor_id}")
+            if name is not None:
+                self.invalidate_sensor_names_cache()
+        return updated
     
     def delete_sensor(self, sensor_id: str) -> bool:
         """Delete a sensor from the database"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM sensors WHERE sensor_id = ?', (sensor_id,))
-            
-            if cursor.rowcount > 0:
-                logger.debug(f"Sensor deleted: {sensor_id}")
-                return True
-            return False
+            deleted = cursor.rowcount > 0
+        
+        if deleted:
+            logger.debug(f"Sensor deleted: {sensor_id}")
+            self.invalidate_sensor_names_cache()
+        return deleted
+    
+    def invalidate_sensor_names_cache(self) -> None:
+        """Drop cached sensor names so the next history read reloads them
+        
+        Call this after modifying the sensors table outside this instance.
+        """
+        with self._cache_lock:
+            self._sensor_names = None
+    
+    def _cached_sensor_names(self) -> Dict[str, str]:
+        """Map of sensor_id to its configured name, read once and cached"""
+        with self._cache_lock:
+            if self._sensor_names is None:
+                with self._reader() as conn:
+                    self._sensor_names = dict(
+                        conn.execute('SELECT sensor_id, name FROM sensors').fetchall())
+            return self._sensor_names
     
     # ==================== HVAC STAGES ====================
     
@@ -432,7 +893,7 @@ class ThermostatDatabase:
         Returns:
             List of stage configurations ordered by stage_number
         """
-        with self._get_connection() as conn:
+        with self._reader() as conn:
             cursor = conn.cursor()
             
             if stage_type and enabled_only:
@@ -480,7 +941,7 @@ class ThermostatDatabase:
         """
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
+            stage_id = _insert_returning_id(cursor, '''
                 INSERT INTO hvac_stages 
                     (stage_type, stage_number, gpio_pin, temp_offset, 
                      min_run_time, enabled, description)
@@ -488,7 +949,6 @@ class ThermostatDatabase:
             ''', (stage_type, stage_number, gpio_pin, temp_offset, 
                   min_run_time, 1 if enabled else 0, description))
             
-            stage_id = cursor.lastrowid
             logger.info(f"Added {stage_type} stage {stage_number}: GPIO {gpio_pin}, "
                        f"offset {temp_offset}°C")
             return stage_id
@@ -552,31 +1012,55 @@ class ThermostatDatabase:
     
     def log_setting_change(self, setting_name: str, old_value: str, 
                           new_value: str, source: str = 'manual') -> None:
-        """Log a setting change to history"""
+        """Log a setting change to history
+        
+        Goes through log_setting_changes_batch() so single and burst
+        changes share one statement and code path.
+        """
+        self.log_setting_changes_batch([(setting_name, old_value, new_value, source)])
+        logger.debug("Logged setting change: %s %s -> %s (%s)", setting_name, old_value, new_value, source)
+    
+    def log_setting_changes_batch(self, changes: List[Tuple[str, str, str, str]]) -> None:
+        """Log multiple setting changes in a single transaction
+        
+        Args:
+            changes: List of (setting_name, old_value, new_value, source) tuples
+        """
+        if not changes:
+            return
+        
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO setting_history (setting_name, old_value, new_value, source)
-                VALUES (?, ?, ?, ?)
-            ''', (setting_name, old_value, new_value, source))
-            logger.debug(f"Logged setting change: {setting_name} {old_value} -> {new_value} ({source})")
+            cursor.executemany(self._SQL_INSERT_SETTING_CHANGE, changes)
+            logger.debug("Logged %d setting changes", len(changes))
     
     def get_setting_history(self, limit: int = 100) -> List[Dict]:
         """Get recent setting changes"""
-        with self._get_connection() as conn:
+        with self._reader() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = None
             cursor.execute('''
                 SELECT * FROM setting_history 
                 ORDER BY timestamp DESC 
                 LIMIT ?
             ''', (limit,))
             
-            results = [dict(row) for row in cursor.fetchall()]
-            # Append 'Z' to timestamps to indicate UTC
+            return self._history_rows(cursor)
+    
+    @staticmethod
+    def _history_rows(cursor: sqlite3.Cursor) -> List[Dict]:
+        """Build result dicts from a plain tuple cursor
+        
+        History reads can return thousands of rows, so they skip sqlite3.Row
+        and zip each tuple with the column names directly. Timestamps get a
+        'Z' appended to indicate UTC.
+        """
+        columns = [description[0] for description in cursor.description]
+        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        if 'timestamp' in columns:
             for row in results:
-                if 'timestamp' in row:
-                    row['timestamp'] = row['timestamp'] + 'Z'
-            return results
+                row['timestamp'] = row['timestamp'] + 'Z'
+        return results
     
     # ==================== SCHEDULES ====================
     
@@ -598,20 +1082,74 @@ class ThermostatDatabase:
             Schedule ID
         """
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO schedules (name, days_of_week, time, target_temp_heat, 
-                                     target_temp_cool, hvac_mode)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (name, days_of_week, time_str, target_temp_heat, target_temp_cool, hvac_mode))
+            schedule_id = _insert_returning_id(
+                conn.cursor(), self._SQL_INSERT_SCHEDULE,
+                self._schedule_params(name, days_of_week, time_str, target_temp_heat,
+                                      target_temp_cool, hvac_mode))
             
-            schedule_id = cursor.lastrowid
             logger.info(f"Created schedule: {name} at {time_str} on {days_of_week}")
-            return schedule_id
+        
+        self.invalidate_schedules_cache()
+        return schedule_id
+    
+    def create_schedules_bulk(self, schedules: List[tuple]) -> List[int]:
+        """Create several schedules in a single transaction
+        
+        Either every schedule is created or, if one fails, none are.
+        
+        Args:
+            schedules: Tuples of create_schedule() arguments, in the same
+                order: (name, days_of_week, time_str[, target_temp_heat,
+                target_temp_cool, hvac_mode])
+        
+        Returns:
+            Schedule IDs, in the order given
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            schedule_ids = [
+                _insert_returning_id(cursor, self._SQL_INSERT_SCHEDULE,
+                                     self._schedule_params(*schedule))
+                for schedule in schedules
+            ]
+            logger.info(f"Created {len(schedule_ids)} schedules")
+        
+        self.invalidate_schedules_cache()
+        return schedule_ids
+    
+    @staticmethod
+    def _schedule_params(name: str, days_of_week: str, time_str: str,
+                         target_temp_heat: Optional[float] = None,
+                         target_temp_cool: Optional[float] = None,
+                         hvac_mode: Optional[str] = None) -> tuple:
+        """Bind parameters for _SQL_INSERT_SCHEDULE"""
+        return (name, days_of_week, time_str, target_temp_heat, target_temp_cool, hvac_mode,
+                days_of_week_mask(days_of_week))
     
     def get_schedules(self, enabled_only: bool = False) -> List[Dict]:
         """Get all schedules"""
-        with self._get_connection() as conn:
+        return [dict(row) for row in self._cached_schedules(enabled_only)]
+    
+    def invalidate_schedules_cache(self) -> None:
+        """Mark cached schedules stale so the next read goes to the database"""
+        with self._cache_lock:
+            self._schedules_version += 1
+    
+    def _cached_schedules(self, enabled_only: bool) -> List[Dict]:
+        """Get schedule rows from the cache, reading them on a miss
+        
+        The returned dicts are shared with the cache and must not be modified.
+        """
+        with self._cache_lock:
+            cached = self._schedules_cache.get(enabled_only)
+            if cached is None or cached[0] != self._schedules_version:
+                cached = (self._schedules_version, self._read_schedules(enabled_only))
+                self._schedules_cache[enabled_only] = cached
+            return cached[1]
+    
+    def _read_schedules(self, enabled_only: bool) -> List[Dict]:
+        """Read schedules from the database"""
+        with self._reader() as conn:
             cursor = conn.cursor()
             
             if enabled_only:
@@ -622,27 +1160,30 @@ class ThermostatDatabase:
             return [dict(row) for row in cursor.fetchall()]
     
     def update_schedule(self, schedule_id: int, **kwargs) -> None:
-        """Update a schedule"""
-        allowed_fields = ['name', 'enabled', 'days_of_week', 'time', 
-                         'target_temp_heat', 'target_temp_cool', 'hvac_mode']
+        """Update a schedule
         
-        updates = {k: v for k, v in kwargs.items() if k in allowed_fields}
+        The UPDATE text is the same whatever fields are given, so it is
+        prepared once and reused from the statement cache. Each column gets
+        a flag saying whether it was passed, which keeps explicit None
+        (e.g. clearing a setpoint) distinct from "leave unchanged".
+        """
+        updates = {k: v for k, v in kwargs.items() if k in self._SCHEDULE_FIELDS}
         if not updates:
             return
         
-        updates['updated_at'] = datetime.now().isoformat()
-        
-        set_clause = ', '.join([f"{k} = ?" for k in updates.keys()])
-        values = list(updates.values()) + [schedule_id]
+        values = []
+        for field in self._SCHEDULE_FIELDS:
+            values += [field in updates, updates.get(field)]
+        days_changed = 'days_of_week' in updates
+        values += [days_changed, days_of_week_mask(updates['days_of_week']) if days_changed else None,
+                   schedule_id]
         
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(f'''
-                UPDATE schedules 
-                SET {set_clause}
-                WHERE id = ?
-            ''', values)
+            cursor.execute(self._SQL_UPDATE_SCHEDULE, values)
             logger.info(f"Updated schedule {schedule_id}: {updates}")
+        
+        self.invalidate_schedules_cache()
     
     def delete_schedule(self, schedule_id: int) -> None:
         """Delete a schedule"""
@@ -650,45 +1191,116 @@ class ThermostatDatabase:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM schedules WHERE id = ?', (schedule_id,))
             logger.info(f"Deleted schedule {schedule_id}")
+        
+        self.invalidate_schedules_cache()
     
     def get_active_schedules(self, current_time: datetime) -> List[Dict]:
-        """Get schedules that should be active now"""
-        day_of_week = current_time.strftime('%a')  # Mon, Tue, etc.
-        day_number = str(current_time.weekday())  # 0-6
-        current_time_str = current_time.strftime('%H:%M')
+        """Get schedules that should be active now
         
-        with self._get_connection() as conn:
+        Seeks idx_schedules_active on (enabled, time) and checks the day
+        with a single bitwise AND against days_mask.
+        """
+        with self._reader() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT * FROM schedules 
-                WHERE enabled = 1 
-                AND (days_of_week LIKE ? OR days_of_week LIKE ?)
+                SELECT * FROM schedules
+                WHERE enabled = 1
                 AND time = ?
-            ''', (f'%{day_of_week}%', f'%{day_number}%', current_time_str))
+                AND (days_mask & ?) != 0
+            ''', (current_time.strftime('%H:%M'), 1 << current_time.weekday()))
             
             return [dict(row) for row in cursor.fetchall()]
     
+    # ==================== BUFFERED WRITES ====================
+    
+    def flush(self) -> None:
+        """Write all buffered history rows in a single transaction
+        
+        If the write fails, the rows are put back at the front of the queues
+        so the next flush retries them.
+        """
+        with self._flush_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        
+        # The hottest write path, so it takes the writer directly instead of
+        # going through _get_connection(). Draining under the same lock keeps
+        # concurrent flushes (timer, control loop, web reads) from racing on
+        # the queues or committing batches out of order.
+        with self._lock:
+            sensor_rows = self._drain(self._sensor_queue)
+            hvac_rows = self._drain(self._hvac_queue)
+            if not sensor_rows and not hvac_rows:
+                return
+            
+            # The connection's own context manager commits, or rolls back if
+            # either insert fails
+            try:
+                conn = self._connect()
+                with conn:
+                    if sensor_rows:
+                        conn.executemany(self._SQL_INSERT_SENSOR, sensor_rows)
+                    if hvac_rows:
+                        conn.executemany(self._SQL_INSERT_HVAC, hvac_rows)
+            except Exception:
+                self._sensor_queue.extendleft(reversed(sensor_rows))
+                self._hvac_queue.extendleft(reversed(hvac_rows))
+                raise
+        logger.debug("Flushed %d sensor and %d HVAC history rows", len(sensor_rows), len(hvac_rows))
+    
+    @staticmethod
+    def _drain(queue: deque) -> List[Tuple]:
+        """Remove and return everything currently in a write queue"""
+        rows = []
+        while queue:
+            rows.append(queue.popleft())
+        return rows
+    
+    def _schedule_flush(self) -> None:
+        """Flush now if the batch is full, otherwise make sure a flush is pending"""
+        if len(self._sensor_queue) + len(self._hvac_queue) >= self.WRITE_BATCH_SIZE:
+            self.flush()
+            return
+        self._arm_flush_timer()
+    
+    def _arm_flush_timer(self) -> None:
+        """Start the flush timer unless one is already pending"""
+        with self._flush_lock:
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.WRITE_FLUSH_INTERVAL, self._timed_flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+    
+    def _timed_flush(self) -> None:
+        """Timer callback: flush, logging and retrying later on failure"""
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Failed to write buffered history, will retry: {e}")
+            self._arm_flush_timer()
+    
     # ==================== SENSOR HISTORY ====================
     
     def log_sensor_reading(self, sensor_id: str, sensor_name: str, 
                           temperature: float, is_compromised: bool = False) -> None:
-        """Log a sensor reading"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO sensor_history (sensor_id, sensor_name, temperature, is_compromised)
-                VALUES (?, ?, ?, ?)
-            ''', (sensor_id, sensor_name, temperature, 1 if is_compromised else 0))
+        """Log a sensor reading
+        
+        The row is buffered and written in a batch; see flush().
+        """
+        self._sensor_queue.append((sensor_id, sensor_name, temperature,
+                                   int(is_compromised), _utc_timestamp()))
+        self._schedule_flush()
     
     def log_sensor_readings_batch(self, readings: List[Tuple[str, str, float, bool]]) -> None:
         """Log multiple sensor readings at once"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.executemany('''
-                INSERT INTO sensor_history (sensor_id, sensor_name, temperature, is_compromised)
-                VALUES (?, ?, ?, ?)
-            ''', readings)
-            logger.debug(f"Logged {len(readings)} sensor readings")
+        timestamp = _utc_timestamp()
+        self._sensor_queue.extend(
+            (sensor_id, sensor_name, temperature, int(is_compromised), timestamp)
+            for sensor_id, sensor_name, temperature, is_compromised in readings
+        )
+        logger.debug("Queued %d sensor readings", len(readings))
+        self._schedule_flush()
     
     def get_sensor_history(self, sensor_id: Optional[str] = None, 
                           hours: int = 24, limit: int = 1000) -> List[Dict]:
@@ -699,49 +1311,97 @@ class ThermostatDatabase:
             hours: Number of hours of history to retrieve
             limit: Maximum number of records
             
-        Returns current sensor name from sensors table via JOIN
+        Returns the current sensor name from the sensors table
         """
-        with self._get_connection() as conn:
+        return list(self.iter_sensor_history(sensor_id, hours, limit))
+    
+    def iter_sensor_history(self, sensor_id: Optional[str] = None,
+                            hours: int = 24, limit: int = 1000) -> Iterator[Dict]:
+        """Yield sensor reading history one row at a time
+        
+        Same rows as get_sensor_history(), decoded as SQLite steps the query
+        rather than all at once. A pooled reader stays checked out until the
+        iterator is exhausted or closed, so consume it promptly.
+        
+        Args:
+            sensor_id: Optional sensor ID to filter by
+            hours: Number of hours of history to retrieve
+            limit: Maximum number of records
+            
+        Yields:
+            One dict per reading, newest first
+        """
+        names = self._cached_sensor_names()
+        with self._sensor_history_cursor(sensor_id, hours, limit) as cursor:
+            columns = [description[0] for description in cursor.description]
+            for row in cursor:
+                reading = dict(zip(columns, row))
+                reading['sensor_name'] = names.get(reading['sensor_id'], reading['sensor_name'])
+                # Append 'Z' to timestamps to indicate UTC
+                reading['timestamp'] += 'Z'
+                yield reading
+    
+    def get_sensor_history_columns(self, sensor_id: Optional[str] = None,
+                                   hours: int = 24, limit: int = 1000) -> Dict[str, List]:
+        """Get sensor reading history as one list per column
+        
+        Same rows as get_sensor_history(), but without a dict per reading,
+        for callers that plot or aggregate whole columns.
+        
+        Args:
+            sensor_id: Optional sensor ID to filter by
+            hours: Number of hours of history to retrieve
+            limit: Maximum number of records
+            
+        Returns:
+            Dict mapping each column name to a list of values, newest first
+        """
+        names = self._cached_sensor_names()
+        with self._sensor_history_cursor(sensor_id, hours, limit) as cursor:
+            columns = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+        
+        values = zip(*rows) if rows else ([] for _ in columns)
+        result = {name: list(column) for name, column in zip(columns, values)}
+        result['sensor_name'] = [names.get(sid, name) for sid, name
+                                 in zip(result['sensor_id'], result['sensor_name'])]
+        # Append 'Z' to timestamps to indicate UTC
+        result['timestamp'] = [timestamp + 'Z' for timestamp in result['timestamp']]
+        return result
+    
+    @contextmanager
+    def _sensor_history_cursor(self, sensor_id: Optional[str], hours: int, limit: int):
+        """Run the sensor history query and yield its plain tuple cursor
+        
+        Only sensor_history is read, so the query is answered from one of its
+        covering indexes. sensor_name is the name stored with each reading;
+        callers swap in the current name from _cached_sensor_names().
+        """
+        cutoff = _utc_cutoff(hours=hours)
+        self.flush()
+        with self._reader() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = None
             
             if sensor_id:
                 cursor.execute('''
-                    SELECT 
-                        sh.id,
-                        sh.sensor_id,
-                        COALESCE(s.name, sh.sensor_name) as sensor_name,
-                        sh.temperature,
-                        sh.is_compromised,
-                        sh.timestamp
-                    FROM sensor_history sh
-                    LEFT JOIN sensors s ON sh.sensor_id = s.sensor_id
-                    WHERE sh.sensor_id = ? 
-                    AND sh.timestamp > datetime('now', '-' || ? || ' hours')
-                    ORDER BY sh.timestamp DESC 
+                    SELECT id, sensor_id, sensor_name, temperature, is_compromised, timestamp
+                    FROM sensor_history
+                    WHERE sensor_id = ? 
+                    AND timestamp > ?
+                    ORDER BY timestamp DESC 
                     LIMIT ?
-                ''', (sensor_id, hours, limit))
+                ''', (sensor_id, cutoff, limit))
             else:
                 cursor.execute('''
-                    SELECT 
-                        sh.id,
-                        sh.sensor_id,
-                        COALESCE(s.name, sh.sensor_name) as sensor_name,
-                        sh.temperature,
-                        sh.is_compromised,
-                        sh.timestamp
-                    FROM sensor_history sh
-                    LEFT JOIN sensors s ON sh.sensor_id = s.sensor_id
-                    WHERE sh.timestamp > datetime('now', '-' || ? || ' hours')
-                    ORDER BY sh.timestamp DESC 
+                    SELECT id, sensor_id, sensor_name, temperature, is_compromised, timestamp
+                    FROM sensor_history
+                    WHERE timestamp > ?
+                    ORDER BY timestamp DESC 
                     LIMIT ?
-                ''', (hours, limit))
+                ''', (cutoff, limit))
             
-            results = [dict(row) for row in cursor.fetchall()]
-            # Append 'Z' to timestamps to indicate UTC
-            for row in results:
-                if 'timestamp' in row:
-                    row['timestamp'] = row['timestamp'] + 'Z'
-            return results
+            yield cursor
     
     # ==================== HVAC HISTORY ====================
     
@@ -762,67 +1422,114 @@ class ThermostatDatabase:
             fan: Fan relay state
             heat2: Heat2 relay state (backwards compat - aux/emergency heat)
             active_stages: List of active stage dicts with 'type', 'number', 'gpio_pin'
+        
+        A state identical to the last one logged (system temperature compared
+        to the nearest 0.5 degree) is skipped until HVAC_HEARTBEAT_INTERVAL
+        has passed, so an idle system doesn't write a row every loop.
         """
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Convert active_stages to JSON string for storage
-            stages_json = None
-            if active_stages:
-                import json
-                stages_json = json.dumps(active_stages)
-            
-            cursor.execute('''
-                INSERT INTO hvac_history (system_temp, target_temp_heat, target_temp_cool, 
-                                        hvac_mode, fan_mode, heat_active, cool_active, 
-                                        fan_active, heat2_active, active_stages)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (system_temp, target_temp_heat, target_temp_cool, hvac_mode, fan_mode,
-                  1 if heat else 0, 1 if cool else 0, 1 if fan else 0, 1 if heat2 else 0,
-                  stages_json))
+        # Convert active_stages to JSON string for storage
+        stages_json = None
+        if active_stages:
+            import json
+            stages_json = json.dumps(active_stages)
+        
+        state = (None if system_temp is None else round(system_temp * 2) / 2,
+                 target_temp_heat, target_temp_cool, hvac_mode, fan_mode,
+                 bool(heat), bool(cool), bool(fan), bool(heat2), stages_json)
+        now = monotonic()
+        if (state == self._last_hvac_state
+                and now - self._last_hvac_logged < self.HVAC_HEARTBEAT_INTERVAL):
+            return
+        self._last_hvac_state = state
+        self._last_hvac_logged = now
+        
+        self._hvac_queue.append((system_temp, target_temp_heat, target_temp_cool, hvac_mode, fan_mode,
+                                 int(heat), int(cool), int(fan), int(heat2),
+                                 stages_json, _utc_timestamp()))
+        self._schedule_flush()
     
     def get_hvac_history(self, hours: int = 24, limit: int = 1000) -> List[Dict]:
         """Get HVAC history"""
-        with self._get_connection() as conn:
+        cutoff = _utc_cutoff(hours=hours)
+        self.flush()
+        with self._reader() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = None
             cursor.execute('''
                 SELECT * FROM hvac_history 
-                WHERE timestamp > datetime('now', '-' || ? || ' hours')
+                WHERE timestamp > ?
                 ORDER BY timestamp DESC 
                 LIMIT ?
-            ''', (hours, limit))
+            ''', (cutoff, limit))
             
-            results = [dict(row) for row in cursor.fetchall()]
-            # Append 'Z' to timestamps to indicate UTC
-            for row in results:
-                if 'timestamp' in row:
-                    row['timestamp'] = row['timestamp'] + 'Z'
-            return results
+            return self._history_rows(cursor)
     
     # ==================== MAINTENANCE ====================
     
     def cleanup_old_history(self, days_to_keep: int = 30) -> None:
-        """Remove old history records"""
+        """Remove old history records
+        
+        Rows are deleted in batches of CLEANUP_BATCH_SIZE, each committed on
+        its own, so a large purge never builds up one huge WAL. The WAL is
+        truncated afterwards.
+        """
+        cutoff = _utc_cutoff(days=days_to_keep)
+        self.flush()
+        
+        # Keep setting history forever (it's small)
+        deleted = self._delete_before(('sensor_history', 'hvac_history'), cutoff)
+        
+        self._release_free_pages()
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Keep setting history forever (it's small)
-            
-            # Clean sensor history
-            cursor.execute('''
-                DELETE FROM sensor_history 
-                WHERE timestamp < datetime('now', '-' || ? || ' days')
-            ''', (days_to_keep,))
-            sensor_deleted = cursor.rowcount
-            
-            # Clean HVAC history
-            cursor.execute('''
-                DELETE FROM hvac_history 
-                WHERE timestamp < datetime('now', '-' || ? || ' days')
-            ''', (days_to_keep,))
-            hvac_deleted = cursor.rowcount
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        
+        logger.info(f"Cleaned up old history: {deleted['sensor_history']} sensor, "
+                    f"{deleted['hvac_history']} HVAC records")
+    
+    def _release_free_pages(self) -> None:
+        """Return free pages to the filesystem, VACUUM_BATCH_PAGES at a time
+        
+        Each batch is its own short write transaction, so other writers get
+        in between batches instead of waiting on the whole reclaim. Does
+        nothing unless auto_vacuum is INCREMENTAL.
+        """
+        while True:
+            with self._get_connection() as conn:
+                if (conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2
+                        or conn.execute('PRAGMA freelist_count').fetchone()[0] == 0):
+                    return
+                # executescript steps the pragma to completion; execute()
+                # would free a single page
+                conn.executescript(f'PRAGMA incremental_vacuum({self.VACUUM_BATCH_PAGES});')
+    
+    def _delete_before(self, tables: Tuple[str, ...], cutoff: str) -> Dict[str, int]:
+        """Delete rows of history tables older than cutoff, batch by batch
+        
+        Each round deletes up to CLEANUP_BATCH_SIZE rows from every table
+        that still has old rows, all in one transaction, so the tables share
+        a commit instead of each paying for their own.
+        
+        Args:
+            tables: History tables to purge
+            cutoff: UTC timestamp string; older rows are deleted
             
-            logger.info(f"Cleaned up old history: {sensor_deleted} sensor, {hvac_deleted} HVAC records")
+        Returns:
+            Number of rows deleted per table
+        """
+        deleted = dict.fromkeys(tables, 0)
+        pending = list(tables)
+        while pending:
+            with self._get_connection() as conn:
+                for table in list(pending):
+                    cursor = conn.execute(f'''
+                        DELETE FROM {table} WHERE rowid IN (
+                            SELECT rowid FROM {table} WHERE timestamp < ? LIMIT ?
+                        )
+                    ''', (cutoff, self.CLEANUP_BATCH_SIZE))
+                    deleted[table] += cursor.rowcount
+                    if cursor.rowcount < self.CLEANUP_BATCH_SIZE:
+                        pending.remove(table)
+        return deleted
     
     def smart_cleanup(self, min_days_to_keep: int = 1825, max_disk_percent: float = 50.0) -> None:
         """Smart cleanup that respects both time and disk space constraints
@@ -833,14 +1540,13 @@ class ThermostatDatabase:
         """
         import shutil
         
-        db_path = Path(self.db_path)
-        if not db_path.exists():
+        if not self._db_file.exists():
             return
         
         # Get disk usage
-        disk_usage = shutil.disk_usage(db_path.parent)
+        disk_usage = shutil.disk_usage(self._db_file.parent)
         total_space = disk_usage.total
-        db_size = db_path.stat().st_size
+        db_size = self._database_size()
         db_percent = (db_size / total_space) * 100
         
         logger.info(f"Database size: {db_size / (1024*1024):.1f} MB ({db_percent:.2f}% of disk)")
@@ -860,11 +1566,17 @@ class ThermostatDatabase:
             for i in range(max_iterations):
                 self.cleanup_old_history(days_to_delete)
                 
-                # Recalculate size after cleanup and VACUUM
+                # cleanup_old_history already hands freed pages back when
+                # auto_vacuum is incremental. Older files still need one full
+                # VACUUM, which also switches them to incremental, so later
+                # passes skip it. In WAL mode the vacuumed pages land in the
+                # WAL, so checkpoint to shrink the files.
                 with self._get_connection() as conn:
-                    conn.execute('VACUUM')
+                    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                        conn.execute('VACUUM')
+                        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
                 
-                db_size = db_path.stat().st_size
+                db_size = self._database_size()
                 db_percent = (db_size / total_space) * 100
                 
                 logger.info(f"After cleanup: {db_size / (1024*1024):.1f} MB ({db_percent:.2f}% of disk)")
@@ -882,18 +1594,25 @@ class ThermostatDatabase:
     
     def get_database_stats(self) -> Dict:
         """Get database statistics"""
-        with self._get_connection() as conn:
+        self.flush()
+        with self._reader() as conn:
             cursor = conn.cursor()
             
             stats = {}
             
-            # Count records in each table
-            for table in ['settings', 'schedules', 'setting_history', 'sensor_history', 'hvac_history']:
-                cursor.execute(f'SELECT COUNT(*) FROM {table}')
-                stats[f'{table}_count'] = cursor.fetchone()[0]
+            # Count records in each table, in one query. settings and
+            # schedules are tiny; the history tables are read from their
+            # trigger-kept counters.
+            cursor.execute('''
+                SELECT 'settings', COUNT(*) FROM settings
+                UNION ALL SELECT 'schedules', COUNT(*) FROM schedules
+                UNION ALL SELECT name, n FROM table_counts
+            ''')
+            for name, count in cursor.fetchall():
+                stats[f'{name}_count'] = count
             
             # Database file size
-            if Path(self.db_path).exists():
-                stats['db_size_mb'] = Path(self.db_path).stat().st_size / (1024 * 1024)
+            if self._db_file.exists():
+                stats['db_size_mb'] = self._database_size() / (1024 * 1024)
             
             return stats
@@ -6,8 +6,9 @@ Handles updating the Waveshare e-ink display
 
 import os
 import time
+from functools import lru_cache
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import AbstractSet, Collection, Dict, List, Optional, Tuple
 from PIL import Image, ImageDraw, ImageFont
 
 try:
@@ -18,12 +19,56 @@ except ImportError:
     print("Warning: Waveshare EPD library not available")
 
 # Import temperature conversion utilities
-from temperature_utils import convert_temperature, get_unit_symbol
+from temperature_utils import convert_temperature, convert_temperatures, get_unit_symbol
+
+FONT_BOLD = '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'
+FONT_REGULAR = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+
+# HVAC status text for each combination of active outputs, indexed by a
+# bitmask of heat (1), cool (2), fan (4) and heat2 (8)
+_HVAC_STATUS = tuple(
+    "+".join(name for bit, name in enumerate(("HEAT", "COOL", "FAN", "HEAT2"))
+             if mask & (1 << bit)) or "OFF"
+    for mask in range(16)
+)
+
+
+@lru_cache(maxsize=32)
+def _load_font(path: str, size: int) -> ImageFont.ImageFont:
+    """Load a TrueType font once per process
+    
+    Args:
+        path: Font file path
+        size: Point size
+        
+    Returns:
+        The font, or PIL's default font if the file can't be loaded
+    """
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        return ImageFont.load_default()
 
 
 class ThermostatDisplay:
     """Manages the e-ink display for the thermostat"""
     
+    # Frames drawn with a partial (fast, flicker-free) refresh between full
+    # refreshes, which clear the ghosting partial refreshes leave behind
+    PARTIAL_UPDATES_PER_FULL = 20
+    
+    # Vertical distance between sensor reading lines, in pixels
+    SENSOR_LINE_HEIGHT = 12
+    
+    # Fixed attribute layout; the per-frame code reads these a lot
+    __slots__ = (
+        'display_type', 'width', 'height', 'epd', 'db', 'temperature_units',
+        '_last_frame', '_last_inputs', '_partial_updates',
+        'font_large', 'font_medium', 'font_small', 'font_tiny', '_line_spacing',
+        '_background', '_target_x', '_hvac_x', '_unit_backgrounds',
+        '_frame', '_frame_draw',
+    )
+    
     def __init__(self, database=None):
         self.display_type = os.getenv('DISPLAY_TYPE', 'waveshare_2in13_v2')
         self.width = 250
@@ -31,6 +76,13 @@ class ThermostatDisplay:
         self.epd = None
         self.db = database
         self.temperature_units = 'F'  # Default to Fahrenheit
+        # Text of the frame currently on the panel, see update()
+        self._last_frame: Optional[List[Tuple]] = None
+        # Arguments of the last frame sent, with the minute it was drawn in
+        self._last_inputs: Optional[Tuple] = None
+        # Partial refreshes since the last full one; starting at the limit
+        # makes the first frame a full refresh
+        self._partial_updates = self.PARTIAL_UPDATES_PER_FULL
         
         if DISPLAY_AVAILABLE:
             try:
@@ -42,26 +94,58 @@ class ThermostatDisplay:
                 print(f"Warning: Could not initialize display: {e}")
                 self.epd = None
         
-        # Load fonts
-        try:
-            self.font_large = ImageFont.truetype(
-                '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', 32)
-            self.font_medium = ImageFont.truetype(
-                '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', 18)
-            self.font_small = ImageFont.truetype(
-                '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', 12)
-            self.font_tiny = ImageFont.truetype(
-                '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', 10)
-        except:
-            # Fall back to default font
-            self.font_large = ImageFont.load_default()
-            self.font_medium = ImageFont.load_default()
-            self.font_small = ImageFont.load_default()
-            self.font_tiny = ImageFont.load_default()
+        # Load fonts (shared by every display instance)
+        self.font_large = _load_font(FONT_BOLD, 32)
+        self.font_medium = _load_font(FONT_BOLD, 18)
+        self.font_small = _load_font(FONT_REGULAR, 12)
+        self.font_tiny = _load_font(FONT_REGULAR, 10)
+        
+        # Multiline text is spaced by the font's line height plus this
+        self._line_spacing = self.SENSOR_LINE_HEIGHT - self.font_tiny.getbbox("A")[3]
+        
+        self._background = self._draw_background()
+        # Background with the unit label drawn in, per unit symbol
+        self._unit_backgrounds: Dict[str, Image.Image] = {}
+        # Frames are drawn into one reused image, see _render()
+        self._frame = self._background.copy()
+        self._frame_draw = ImageDraw.Draw(self._frame)
+    
+    def _draw_background(self) -> Image:
+        """Draw the parts of the screen that never change
+        
+        Each frame starts from a copy of this, so only the values are
+        rasterized per update. The label widths give where the values go.
+        """
+        # Create blank image (note: rotated 90 degrees for landscape)
+        image = Image.new('1', (self.height, self.width), 255)
+        draw = ImageDraw.Draw(image)
+        
+        draw.text((10, 45), "Target: ", font=self.font_small, fill=0)
+        self._target_x = 10 + round(draw.textlength("Target: ", font=self.font_small))
+        draw.text((10, 60), "HVAC: ", font=self.font_medium, fill=0)
+        self._hvac_x = 10 + round(draw.textlength("HVAC: ", font=self.font_medium))
+        
+        # Divider line
+        draw.line([(10, 85), (self.height-10, 85)], fill=0, width=1)
+        
+        return image
+    
+    def _unit_background(self, unit_symbol: str) -> Image:
+        """Get the background with the current temperature's unit label
+        
+        The label overlaps the temperature digits, so it is drawn into a
+        cached copy of the background rather than pasted over each frame.
+        """
+        background = self._unit_backgrounds.get(unit_symbol)
+        if background is None:
+            background = self._background.copy()
+            ImageDraw.Draw(background).text((90, 20), unit_symbol, font=self.font_small, fill=0)
+            self._unit_backgrounds[unit_symbol] = background
+        return background
     
     def create_display_image(self, system_temp: float, target_temp: float, 
                             hvac_state: Dict, sensor_readings: List,
-                            compromised_sensors: List[str]) -> Image:
+                            compromised_sensors: Collection[str]) -> Image:
         """Create an image for the display
         
         Args:
@@ -69,7 +153,23 @@ class ThermostatDisplay:
             target_temp: Target temperature in Celsius
             hvac_state: Current HVAC state
             sensor_readings: List of sensor readings (in Celsius)
-            compromised_sensors: List of compromised sensor IDs
+            compromised_sensors: Compromised sensor IDs; pass a set to avoid
+                a copy per frame
+        """
+        return self._render(self._layout(system_temp, target_temp, hvac_state,
+                                         sensor_readings, compromised_sensors,
+                                         datetime.now())).copy()
+    
+    def _layout(self, system_temp: float, target_temp: float, hvac_state: Dict,
+                sensor_readings: List, compromised_sensors: Collection[str],
+                now: datetime) -> List[Tuple]:
+        """Work out what text goes where on the screen
+        
+        Args:
+            now: Time shown on the clock
+        
+        Returns:
+            List of (position, text, font) tuples
         """
         # Load current temperature unit preference
         if self.db:
@@ -82,56 +182,71 @@ class ThermostatDisplay:
         display_target_temp = convert_temperature(target_temp, 'C', self.temperature_units)
         unit_symbol = get_unit_symbol(self.temperature_units)
         
-        # Create blank image (note: rotated 90 degrees for landscape)
-        image = Image.new('1', (self.height, self.width), 255)
-        draw = ImageDraw.Draw(image)
-        
-        # Current temperature (large, centered top)
-        temp_str = f"{display_system_temp:.1f}"
-        draw.text((10, 5), temp_str, font=self.font_large, fill=0)
-        draw.text((90, 20), unit_symbol, font=self.font_small, fill=0)
+        # Current temperature (large, centered top); its unit label is part
+        # of the background, see _render()
+        texts = [
+            ((10, 5), f"{display_system_temp:.1f}", self.font_large),
+        ]
         
         # Target temperature
-        target_str = f"Target: {display_target_temp:.1f}{unit_symbol}"
-        draw.text((10, 45), target_str, font=self.font_small, fill=0)
+        texts.append(((self._target_x, 45), f"{display_target_temp:.1f}{unit_symbol}", self.font_small))
         
         # HVAC status
-        status_parts = []
-        if hvac_state.get('heat'): status_parts.append("HEAT")
-        if hvac_state.get('cool'): status_parts.append("COOL")
-        if hvac_state.get('fan'): status_parts.append("FAN")
-        if hvac_state.get('heat2'): status_parts.append("HEAT2")
-        
-        status_str = "+".join(status_parts) if status_parts else "OFF"
-        draw.text((10, 60), f"HVAC: {status_str}", font=self.font_medium, fill=0)
-        
-        # Divider line
-        draw.line([(10, 85), (self.height-10, 85)], fill=0, width=1)
+        status_str = _HVAC_STATUS[bool(hvac_state.get('heat'))
+                                  | bool(hvac_state.get('cool')) << 1
+                                  | bool(hvac_state.get('fan')) << 2
+                                  | bool(hvac_state.get('heat2')) << 3]
+        texts.append(((self._hvac_x, 60), status_str, self.font_medium))
         
-        # Individual sensor readings (small, scrolling if needed)
-        y_pos = 90
-        for reading in sensor_readings[:5]:  # Show up to 5 sensors
+        # Individual sensor readings (small, scrolling if needed), drawn as
+        # one block of text
+        compromised = compromised_sensors
+        if not isinstance(compromised, AbstractSet):
+            compromised = set(compromised)
+        shown = sensor_readings[:5]  # Show up to 5 sensors
+        temps_display = convert_temperatures(
+            [reading.temperature for reading in shown], 'C', self.temperature_units)
+        lines = []
+        for reading, temp_display in zip(shown, temps_display):
             sensor_name = reading.name[:10]  # Truncate long names
-            temp_celsius = reading.temperature
-            temp_display = convert_temperature(temp_celsius, 'C', self.temperature_units)
             
             # Mark compromised sensors
-            marker = "!" if reading.sensor_id in compromised_sensors else " "
+            marker = "!" if reading.sensor_id in compromised else " "
             
-            text = f"{marker}{sensor_name}: {temp_display:.1f}{unit_symbol}"
-            draw.text((10, y_pos), text, font=self.font_tiny, fill=0)
-            y_pos += 12
+            lines.append(f"{marker}{sensor_name}: {temp_display:.1f}{unit_symbol}")
+        if lines:
+            texts.append(((10, 90), "\n".join(lines), self.font_tiny))
         
         # Timestamp
-        time_str = datetime.now().strftime("%m/%d %H:%M")
-        draw.text((self.height-60, 235), time_str, font=self.font_tiny, fill=0)
+        time_str = now.strftime("%m/%d %H:%M")
+        texts.append(((self.height-60, 235), time_str, self.font_tiny))
         
-        return image
+        return texts
+    
+    def _render(self, texts: List[Tuple]) -> Image:
+        """Draw laid-out text over the background for the current units
+        
+        The returned image is reused by the next call; copy it to keep it.
+        """
+        self._frame.paste(self._unit_background(get_unit_symbol(self.temperature_units)))
+        for position, text, font in texts:
+            # spacing only applies to text with several lines
+            self._frame_draw.text(position, text, font=font, fill=0,
+                                  spacing=self._line_spacing)
+        
+        return self._frame
     
     def update(self, system_temp: float, target_temp: float, 
               hvac_state: Dict, sensor_readings: List = None,
-              compromised_sensors: List[str] = None) -> bool:
-        """Update the display with current information"""
+              compromised_sensors: Optional[Collection[str]] = None) -> bool:
+        """Update the display with current information
+        
+        Within the same minute, calls with the same arguments as the last
+        frame return straight away, without laying out the frame (a change
+        of temperature units is picked up on the next minute). If the
+        screen would show exactly the same text as the last frame, nothing
+        is redrawn or sent to the panel.
+        """
         if not self.epd:
             # No display available, skip
             return False
@@ -139,26 +254,61 @@ class ThermostatDisplay:
         if sensor_readings is None:
             sensor_readings = []
         if compromised_sensors is None:
-            compromised_sensors = []
+            compromised_sensors = frozenset()
         
         try:
-            # Create image
-            image = self.create_display_image(
-                system_temp, target_temp, hvac_state, 
-                sensor_readings, compromised_sensors
+            now = datetime.now()
+            shown = sensor_readings[:5]
+            inputs = (
+                now.replace(second=0, microsecond=0), system_temp, target_temp,
+                dict(hvac_state),
+                [(r.sensor_id, r.name, r.temperature, r.sensor_id in compromised_sensors)
+                 for r in shown],
             )
+            if inputs == self._last_inputs:
+                return True
             
-            # Update display
-            self.epd.display(self.epd.getbuffer(image))
+            texts = self._layout(
+                system_temp, target_temp, hvac_state, 
+                shown, compromised_sensors, now
+            )
+            frame = [(position, text) for position, text, _ in texts]
+            if frame != self._last_frame:
+                # Create image and update display
+                image = self._render(texts)
+                self._refresh(self.epd.getbuffer(image))
+                self._last_frame = frame
+            self._last_inputs = inputs
             return True
         
         except Exception as e:
             print(f"Error updating display: {e}")
             return False
     
+    def _refresh(self, buffer) -> None:
+        """Send a frame to the panel
+        
+        Most frames use a partial refresh. Every PARTIAL_UPDATES_PER_FULL
+        frames, or when the panel state is unknown, a full refresh is done.
+        """
+        if self._partial_updates < self.PARTIAL_UPDATES_PER_FULL:
+            if self._partial_updates == 0:
+                # First partial frame since a full refresh
+                self.epd.init(self.epd.PART_UPDATE)
+            self.epd.displayPartial(buffer)
+            self._partial_updates += 1
+        else:
+            self.epd.init(self.epd.FULL_UPDATE)
+            self.epd.display(buffer)
+            self._partial_updates = 0
+    
     def clear(self):
         """Clear the display"""
         if self.epd:
+            # The next update has to redraw, and starts from a full refresh
+            self._last_frame = None
+            self._last_inputs = None
+            self._partial_updates = self.PARTIAL_UPDATES_PER_FULL
             try:
                 self.epd.Clear(0xFF)
             except Exception as e:
@@ -167,6 +317,8 @@ class ThermostatDisplay:
     def sleep(self):
         """Put display in low-power sleep mode"""
         if self.epd:
+            # Waking the panel needs a full init
+            self._partial_updates = self.PARTIAL_UPDATES_PER_FULL
             try:
                 self.epd.sleep()
             except Exception as e:
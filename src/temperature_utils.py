@@ -4,7 +4,13 @@ Temperature conversion utilities for thermostat
 Handles conversion between Celsius, Fahrenheit, and Kelvin
 """
 
-from typing import Union
+from typing import Iterable, List, Optional, Union
+
+# Folded constants for the direct Fahrenheit <-> Kelvin conversions
+_FIVE_NINTHS = 5.0 / 9.0
+_NINE_FIFTHS = 9.0 / 5.0
+_F_TO_K_OFFSET = 273.15 - 32.0 * _FIVE_NINTHS
+_K_TO_F_OFFSET = 32.0 - 273.15 * _NINE_FIFTHS  # -459.67
 
 
 def celsius_to_fahrenheit(celsius: float) -> float:
@@ -64,7 +70,7 @@ def fahrenheit_to_kelvin(fahrenheit: float) -> float:
     Returns:
         Temperature in Kelvin
     """
-    return celsius_to_kelvin(fahrenheit_to_celsius(fahrenheit))
+    return fahrenheit * _FIVE_NINTHS + _F_TO_K_OFFSET
 
 
 def kelvin_to_fahrenheit(kelvin: float) -> float:
@@ -76,7 +82,18 @@ def kelvin_to_fahrenheit(kelvin: float) -> float:
     Returns:
         Temperature in degrees Fahrenheit
     """
-    return celsius_to_fahrenheit(kelvin_to_celsius(kelvin))
+    return kelvin * _NINE_FIFTHS + _K_TO_F_OFFSET
+
+
+# Direct conversion for each pair of different units
+_CONVERTERS = {
+    ('C', 'F'): celsius_to_fahrenheit,
+    ('F', 'C'): fahrenheit_to_celsius,
+    ('C', 'K'): celsius_to_kelvin,
+    ('K', 'C'): kelvin_to_celsius,
+    ('F', 'K'): fahrenheit_to_kelvin,
+    ('K', 'F'): kelvin_to_fahrenheit,
+}
 
 
 def convert_temperature(temp: float, from_unit: str, to_unit: str) -> float:
@@ -101,25 +118,45 @@ def convert_temperature(temp: float, from_unit: str, to_unit: str) -> float:
     if from_unit == to_unit:
         return temp
     
-    # Convert to Celsius first (our base unit)
-    if from_unit == 'C':
-        temp_celsius = temp
-    elif from_unit == 'F':
-        temp_celsius = fahrenheit_to_celsius(temp)
-    elif from_unit == 'K':
-        temp_celsius = kelvin_to_celsius(temp)
-    else:
-        raise ValueError(f"Unsupported temperature unit: {from_unit}")
+    # One table lookup and one direct conversion, rather than going through
+    # Celsius with a chain of comparisons
+    try:
+        convert = _CONVERTERS[(from_unit, to_unit)]
+    except KeyError:
+        unit = to_unit if from_unit in ('C', 'F', 'K') else from_unit
+        raise ValueError(f"Unsupported temperature unit: {unit}") from None
+    return convert(temp)
+
+
+def convert_temperatures(temps: Iterable[Optional[float]], from_unit: str,
+                         to_unit: str) -> List[Optional[float]]:
+    """Convert many temperatures between the same pair of units
     
-    # Convert from Celsius to target unit
-    if to_unit == 'C':
-        return temp_celsius
-    elif to_unit == 'F':
-        return celsius_to_fahrenheit(temp_celsius)
-    elif to_unit == 'K':
-        return celsius_to_kelvin(temp_celsius)
-    else:
-        raise ValueError(f"Unsupported temperature unit: {to_unit}")
+    The units are checked and the conversion picked once for the whole
+    batch, instead of once per value as with convert_temperature().
+    
+    Args:
+        temps: Temperature values to convert; None values are kept as None
+        from_unit: Source unit ('C', 'F', or 'K')
+        to_unit: Target unit ('C', 'F', or 'K')
+        
+    Returns:
+        Converted values, in the same order
+        
+    Raises:
+        ValueError: If unit is not supported
+    """
+    from_unit = from_unit.upper()
+    to_unit = to_unit.upper()
+    for unit in (from_unit, to_unit):
+        if unit not in ('C', 'F', 'K'):
+            raise ValueError(f"Unsupported temperature unit: {unit}")
+    
+    if from_unit == to_unit:
+        return list(temps)
+    
+    convert = _CONVERTERS[(from_unit, to_unit)]
+    return [None if temp is None else convert(temp) for temp in temps]
 
 
 def get_unit_symbol(unit: str) -> str:
@@ -4,13 +4,16 @@ Raspberry Pi Multi-Zone Thermostat
 Main control application
 """
 
+import glob
 import os
 import sys
 import time
 import logging
+import threading
+from collections import deque
 from datetime import datetime, timedelta
 from statistics import median
-from typing import Dict, List, Optional
+from typing import Deque, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
 try:
@@ -79,9 +82,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# w1_therm bulk read entries, one per 1-Wire bus master (Linux 5.10+)
+W1_BULK_READ_GLOB = '/sys/bus/w1/devices/w1_bus_master*/therm_bulk_read'
+# Longest wait for a bulk conversion; 12-bit conversions take up to 750 ms
+W1_BULK_READ_TIMEOUT = 1.0
+
 
 class SensorReading:
     """Represents a temperature reading from a sensor"""
+    __slots__ = ('sensor_id', 'name', 'temperature', 'timestamp', 'is_compromised')
+    
     def __init__(self, sensor_id: str, name: str, temperature: float, timestamp: datetime):
         self.sensor_id = sensor_id
         self.name = name
@@ -99,7 +109,11 @@ class ThermostatController:
         if DATABASE_AVAILABLE:
             db_path = os.getenv('DATABASE_PATH', 'thermostat.db')
             if db_path:  # Only create database if path is set
-                self.db = ThermostatDatabase(db_path)
+                flush_interval = os.getenv('HISTORY_FLUSH_INTERVAL')
+                self.db = ThermostatDatabase(
+                    db_path,
+                    write_flush_interval=float(flush_interval) if flush_interval else None
+                )
                 logger.info(f"Database initialized: {db_path}")
         
         # Load configuration from environment (defaults in Fahrenheit, converted to Celsius)
@@ -156,7 +170,10 @@ class ThermostatController:
                 self.monitored_sensors = [s.strip() for s in monitored.split(',') if s.strip()]
         
         # State tracking
-        self.sensor_history: Dict[str, List[SensorReading]] = {}
+        # Last 30 minutes of readings per sensor, oldest first. The length
+        # bound is a backstop; readings are expired by time
+        self.sensor_history: Dict[str, Deque[SensorReading]] = {}
+        self._sensor_history_len = max(8, 30 * 60 // max(1, self.sensor_read_interval) + 4)
         self.compromised_sensors: Dict[str, datetime] = {}
         # Track stage states dynamically
         self.active_heat_stages: List[int] = []  # List of active heating stage numbers
@@ -165,13 +182,23 @@ class ThermostatController:
         self.hvac_state = {'heat': False, 'cool': False, 'fan': False, 'heat2': False}
         self.last_hvac_change = datetime.now()
         self.last_stage_changes: Dict[Tuple[str, int], datetime] = {}  # Track per-stage timing
-        self.last_sensor_read = datetime.now() - timedelta(seconds=self.sensor_read_interval)
-        self.last_history_log = datetime.now()
-        self.last_schedule_check = datetime.now()
-        self.last_cleanup = datetime.now()
+        # Control loop timers, in time.monotonic() seconds so that a wall
+        # clock jump (e.g. NTP setting the time after boot) can't stall or
+        # bunch them up
+        started = time.monotonic()
+        self.last_history_log = started
+        self.last_schedule_check = started
+        self.last_cleanup = started
         self.latest_readings: List[SensorReading] = []
         self.latest_system_temp: Optional[float] = None
         
+        # Sensors are read by a background thread while run() is active;
+        # it leaves each batch here for the control loop to pick up
+        self._readings_lock = threading.Lock()
+        self._pending_readings: Optional[List[SensorReading]] = None
+        self._stop_polling = threading.Event()
+        self._sensor_poller: Optional[threading.Thread] = None
+        
         # Schedule control
         self.schedule_enabled = os.getenv('SCHEDULE_ENABLED', 'true').lower() == 'true'
         self.schedule_hold_until: Optional[datetime] = None  # Hold manual changes until this time
@@ -278,14 +305,18 @@ class ThermostatController:
             return
         
         sensors = self.db.get_sensors(enabled_only=True)
-        self.sensor_map = {}
-        self.monitored_sensors = []
+        sensor_map = {}
+        monitored_sensors = []
         
         for sensor in sensors:
-            self.sensor_map[sensor['sensor_id']] = sensor['name']
+            sensor_map[sensor['sensor_id']] = sensor['name']
             # Only add sensors that are both enabled AND monitored
             if sensor.get('monitored', False):
-                self.monitored_sensors.append(sensor['sensor_id'])
+                monitored_sensors.append(sensor['sensor_id'])
+        
+        # Swapped in whole, as the sensor reader thread may be reloading
+        self.sensor_map = sensor_map
+        self.monitored_sensors = monitored_sensors
         
         logger.debug(f"Loaded {len(self.sensor_map)} enabled sensors from database "
                     f"({len(self.monitored_sensors)} monitored for system temperature)")
@@ -306,6 +337,38 @@ class ThermostatController:
                 # Reload sensor map to include the new sensor
                 self._load_sensors_from_database()
     
+    def _start_bulk_conversion(self) -> bool:
+        """Convert the temperature on every sensor at once
+        
+        Sends a single broadcast Convert T on each 1-Wire bus and waits for
+        it to finish, instead of each sensor read waiting for its own
+        conversion. Reading a sensor afterwards returns the converted value.
+        
+        Returns:
+            True if the conversion ran, False if bulk reads aren't available
+        """
+        bulk_read_paths = glob.glob(W1_BULK_READ_GLOB)
+        if not bulk_read_paths:
+            return False
+        
+        try:
+            for path in bulk_read_paths:
+                with open(path, 'w') as f:
+                    f.write('trigger\n')
+            
+            # Reads back -1 while a conversion is still running
+            deadline = time.monotonic() + W1_BULK_READ_TIMEOUT
+            for path in bulk_read_paths:
+                while time.monotonic() < deadline:
+                    with open(path) as f:
+                        if f.read().strip() != '-1':
+                            break
+                    time.sleep(0.05)
+            return True
+        except OSError as e:
+            logger.debug("Bulk temperature conversion unavailable: %s", e)
+            return False
+    
     def read_sensors(self) -> List[SensorReading]:
         """Read all temperature sensors (stores in Celsius)"""
         readings = []
@@ -319,6 +382,9 @@ class ThermostatController:
             return readings
         
         try:
+            # Without bulk reads, each get_temperature() runs its own conversion
+            self._start_bulk_conversion()
+            
             detected_sensor_ids = []
             for sensor in W1ThermSensor.get_available_sensors():
                 sensor_id = sensor.id
@@ -328,10 +394,10 @@ class ThermostatController:
                 # Use configured name if available, otherwise use sensor ID
                 if sensor_id in self.sensor_map:
                     name = self.sensor_map[sensor_id]
-                    logger.debug(f"Sensor {name}: {temp_c:.1f}°C")
+                    logger.debug("Sensor %s: %.1f°C", name, temp_c)
                 else:
                     name = f"Unconfigured ({sensor_id[:8]})"
-                    logger.debug(f"Sensor {sensor_id} (unconfigured): {temp_c:.1f}°C")
+                    logger.debug("Sensor %s (unconfigured): %.1f°C", sensor_id, temp_c)
                 
                 readings.append(SensorReading(sensor_id, name, temp_c, datetime.now()))
             
@@ -343,82 +409,119 @@ class ThermostatController:
         
         return readings
     
-    def detect_anomalies(self, readings: List[SensorReading]) -> None:
+    def detect_anomalies(self, readings: List[SensorReading],
+                         now: Optional[datetime] = None) -> Optional[List[float]]:
         """Detect compromised sensors (e.g., near active fireplace)
         
         All enabled sensors are automatically monitored for anomalies like rapid
         temperature changes and deviations from the average.
+        
+        Args:
+            readings: Latest reading from each sensor
+            now: Current time, if the caller already has it
+        
+        Returns:
+            Temperatures from the sensors still valid after this pass, for
+            calculate_system_temperature(), or None if too few readings
         """
         if len(readings) < 2:
-            return
+            return None
+        
+        # One clock reading for the whole pass
+        now = now or datetime.now()
+        five_min_ago = now - timedelta(minutes=5)
         
         # Calculate average temperature (excluding already compromised sensors)
-        valid_temps = [r.temperature for r in readings 
-                      if not self._is_sensor_compromised(r.sensor_id)]
-        if not valid_temps:
-            return
+        valid_readings = [r for r in readings
+                          if not self._is_sensor_compromised(r.sensor_id, now)]
+        if not valid_readings:
+            return []
         
+        valid_temps = [r.temperature for r in valid_readings]
         avg_temp = sum(valid_temps) / len(valid_temps)
+        marked = set()
         
         # Check each monitored sensor
         for reading in readings:
-            if reading.sensor_id not in self.monitored_sensors:
+            if reading.sensor_id not in self._monitored_sensor_set:
                 continue
             
             # Check for rapid temperature change
             if reading.sensor_id in self.sensor_history:
                 history = self.sensor_history[reading.sensor_id]
                 if history:
-                    # Check readings from 5 minutes ago
-                    five_min_ago = datetime.now() - timedelta(minutes=5)
-                    old_readings = [r for r in history if r.timestamp <= five_min_ago]
-                    if old_readings:
-                        temp_change = reading.temperature - old_readings[-1].temperature
+                    # Check the newest reading from at least 5 minutes ago
+                    old_reading = next((r for r in reversed(history)
+                                        if r.timestamp <= five_min_ago), None)
+                    if old_reading:
+                        temp_change = reading.temperature - old_reading.temperature
                         if abs(temp_change) > self.anomaly_threshold:
                             self._mark_sensor_compromised(reading.sensor_id, 
-                                f"Rapid change: {temp_change:.1f}°F in 5 min")
+                                f"Rapid change: {temp_change:.1f}°F in 5 min", now)
+                            marked.add(reading.sensor_id)
             
             # Check for deviation from average
             deviation = reading.temperature - avg_temp
             if deviation > self.deviation_threshold:
                 self._mark_sensor_compromised(reading.sensor_id,
-                    f"Deviation: {deviation:.1f}°F above average")
+                    f"Deviation: {deviation:.1f}°F above average", now)
+                marked.add(reading.sensor_id)
         
         # Clear expired compromised flags
-        now = datetime.now()
         expired = [sid for sid, expire_time in self.compromised_sensors.items() 
                   if now > expire_time]
         for sensor_id in expired:
             del self.compromised_sensors[sensor_id]
             logger.info(f"Sensor {self.sensor_map.get(sensor_id, sensor_id)} "
                        f"cleared from compromised status")
+        
+        if marked:
+            return [r.temperature for r in valid_readings if r.sensor_id not in marked]
+        return valid_temps
     
-    def _mark_sensor_compromised(self, sensor_id: str, reason: str) -> None:
+    def _mark_sensor_compromised(self, sensor_id: str, reason: str,
+                                 now: Optional[datetime] = None) -> None:
         """Mark a sensor as compromised"""
         if sensor_id not in self.compromised_sensors:
-            expire_time = datetime.now() + timedelta(seconds=self.ignore_duration)
+            expire_time = (now or datetime.now()) + timedelta(seconds=self.ignore_duration)
             self.compromised_sensors[sensor_id] = expire_time
             logger.warning(f"Sensor {self.sensor_map.get(sensor_id, sensor_id)} "
                          f"marked as compromised: {reason}")
     
-    def _is_sensor_compromised(self, sensor_id: str) -> bool:
-        """Check if a sensor is currently compromised"""
-        if sensor_id not in self.compromised_sensors:
+    def _is_sensor_compromised(self, sensor_id: str, now: Optional[datetime] = None) -> bool:
+        """Check if a sensor is currently compromised
+        
+        Args:
+            sensor_id: Sensor to check
+            now: Current time, if the caller already has it
+        """
+        expire_time = self.compromised_sensors.get(sensor_id)
+        if expire_time is None:
             return False
-        return datetime.now() < self.compromised_sensors[sensor_id]
+        return (now or datetime.now()) < expire_time
     
-    def calculate_system_temperature(self, readings: List[SensorReading]) -> Optional[float]:
-        """Calculate the system temperature using median of valid sensors"""
-        valid_temps = [r.temperature for r in readings 
-                      if not self._is_sensor_compromised(r.sensor_id)]
+    def calculate_system_temperature(self, readings: List[SensorReading],
+                                     now: Optional[datetime] = None,
+                                     valid_temps: Optional[List[float]] = None) -> Optional[float]:
+        """Calculate the system temperature using median of valid sensors
+        
+        Args:
+            readings: Latest reading from each sensor
+            now: Current time, if the caller already has it
+            valid_temps: Valid temperatures from detect_anomalies(), if known
+        """
+        if valid_temps is None:
+            now = now or datetime.now()
+            valid_temps = [r.temperature for r in readings 
+                          if not self._is_sensor_compromised(r.sensor_id, now)]
         
         if not valid_temps:
             logger.error("No valid temperature readings available!")
             return None
         
         system_temp = median(valid_temps)
-        logger.debug(f"System temperature: {system_temp:.1f}°F "
-                    f"(from {len(valid_temps)}/{len(readings)} sensors)")
+        logger.debug("System temperature: %.1f°F (from %d/%d sensors)",
+                     system_temp, len(valid_temps), len(readings))
         return system_temp
     
     def control_hvac(self, system_temp: float) -> None:
@@ -442,7 +545,8 @@ class ThermostatController:
         hvac_currently_active = len(self.active_heat_stages) > 0 or len(self.active_cool_stages) > 0
         
         if not hvac_currently_active and time_since_last_change < self.hvac_min_rest_time:
-            logger.debug(f"HVAC minimum rest time not met ({time_since_last_change:.0f}s < {self.hvac_min_rest_time}s)")
+            logger.debug("HVAC minimum rest time not met (%.0fs < %ss)",
+                         time_since_last_change, self.hvac_min_rest_time)
             return
         
         # Heating mode
@@ -536,6 +640,20 @@ class ThermostatController:
             stages_to_activate: List of stage numbers that should be active
             fan_state: Desired fan state
         """
+        # Holding the current state is by far the common case, so settle it
+        # before copying stage lists or reading the clock
+        if stage_type == 'heat':
+            unchanged = stages_to_activate == self.active_heat_stages
+        else:
+            unchanged = stages_to_activate == self.active_cool_stages
+        if unchanged and fan_state == self.hvac_state['fan']:
+            # Still update hvac_state to ensure consistency even if GPIO doesn't change
+            state = self.hvac_state
+            state['heat'] = len(self.active_heat_stages) > 0
+            state['cool'] = len(self.active_cool_stages) > 0
+            state['heat2'] = 2 in self.active_heat_stages
+            return
+        
         now = datetime.now()
         
         # Get current active stages and stage list
@@ -553,8 +671,8 @@ class ThermostatController:
                 time_since_change = (now - self.last_stage_changes[stage_key]).total_seconds()
                 stage = next((s for s in stage_list if s['stage_number'] == stage_num), None)
                 if stage and time_since_change < stage.get('min_run_time', 300):
-                    logger.debug(f"{stage_type} stage {stage_num} minimum run time not met "
-                               f"({time_since_change:.0f}s < {stage.get('min_run_time', 300)}s)")
+                    logger.debug("%s stage %s minimum run time not met (%.0fs < %ss)",
+                                 stage_type, stage_num, time_since_change, stage.get('min_run_time', 300))
                     return  # Don't change anything yet
         
         # Check minimum rest time for stages we want to activate
@@ -565,8 +683,8 @@ class ThermostatController:
                     time_since_change = (now - self.last_stage_changes[stage_key]).total_seconds()
                     stage = next((s for s in stage_list if s['stage_number'] == stage_num), None)
                     if stage and time_since_change < stage.get('min_run_time', 300):
-                        logger.debug(f"{stage_type} stage {stage_num} minimum rest time not met "
-                                   f"({time_since_change:.0f}s < {stage.get('min_run_time', 300)}s)")
+                        logger.debug("%s stage %s minimum rest time not met (%.0fs < %ss)",
+                                     stage_type, stage_num, time_since_change, stage.get('min_run_time', 300))
                         return  # Don't activate yet
         
         # Safety check: don't activate both heat and cool
@@ -577,17 +695,6 @@ class ThermostatController:
             logger.error("Safety violation: Attempted to activate cool while heating is active!")
             return
         
-        # Check if anything is actually changing (GPIO-wise)
-        gpio_changes = stages_to_activate != current_active or fan_state != self.hvac_state['fan']
-        
-        if not gpio_changes:
-            # Still update hvac_state to ensure consistency even if GPIO doesn't change
-            self.hvac_state['heat'] = len(self.active_heat_stages) > 0
-            self.hvac_state['cool'] = len(self.active_cool_stages) > 0
-            self.hvac_state['fan'] = fan_state
-            self.hvac_state['heat2'] = 2 in self.active_heat_stages
-            return
-        
         # Update GPIO pins for changed stages
         if GPIO:
             for stage in stage_list:
@@ -601,8 +708,9 @@ class ThermostatController:
                     logger.info(f"{stage_type.title()} Stage {stage_num} ({'ON' if should_be_active else 'OFF'}): "
                                f"GPIO {stage['gpio_pin']}")
             
-            # Update fan
-            GPIO.output(self.fan_gpio_pin, GPIO.HIGH if fan_state else GPIO.LOW)
+            # Update fan, if it's changing (hvac_state holds the level last written)
+            if fan_state != self.hvac_state['fan']:
+                GPIO.output(self.fan_gpio_pin, GPIO.HIGH if fan_state else GPIO.LOW)
         
         # Update active stage lists
         if stage_type == 'heat':
@@ -627,20 +735,22 @@ class ThermostatController:
             active_desc.append("FAN")
         logger.info(f"HVAC state: {' + '.join(active_desc) if active_desc else 'OFF'}")
     
-    def update_sensor_history(self, readings: List[SensorReading]) -> None:
+    def update_sensor_history(self, readings: List[SensorReading],
+                              now: Optional[datetime] = None) -> None:
         """Update sensor reading history"""
+        # Keep only last 30 minutes of history
+        cutoff_time = (now or datetime.now()) - timedelta(minutes=30)
         for reading in readings:
-            if reading.sensor_id not in self.sensor_history:
-                self.sensor_history[reading.sensor_id] = []
+            history = self.sensor_history.get(reading.sensor_id)
+            if history is None:
+                history = deque(maxlen=self._sensor_history_len)
+                self.sensor_history[reading.sensor_id] = history
             
-            self.sensor_history[reading.sensor_id].append(reading)
+            history.append(reading)
             
-            # Keep only last 30 minutes of history
-            cutoff_time = datetime.now() - timedelta(minutes=30)
-            self.sensor_history[reading.sensor_id] = [
-                r for r in self.sensor_history[reading.sensor_id] 
-                if r.timestamp > cutoff_time
-            ]
+            # Readings are in time order, so expired ones are at the front
+            while history and history[0].timestamp <= cutoff_time:
+                history.popleft()
     
     def get_status(self) -> Dict:
         """Get current system status"""
@@ -677,6 +787,21 @@ class ThermostatController:
         """Get current fan mode as string ('on' for continuous, 'auto' for automatic)"""
         return 'on' if self.manual_fan_mode else 'auto'
     
+    @property
+    def monitored_sensors(self) -> Tuple[str, ...]:
+        """Sensor IDs checked for anomalies, in configuration order
+        
+        Read-only; assign a new sequence to change it, so the set used by
+        detect_anomalies() stays in step.
+        """
+        return self._monitored_sensors
+    
+    @monitored_sensors.setter
+    def monitored_sensors(self, sensor_ids: List[str]) -> None:
+        # A set alongside the tuple for membership tests in detect_anomalies()
+        self._monitored_sensors = tuple(sensor_ids)
+        self._monitored_sensor_set = frozenset(self._monitored_sensors)
+    
     def _update_web_interface(self) -> None:
         """Update web interface with current state"""
         if self.web_enabled and WEB_INTERFACE_AVAILABLE:
@@ -685,30 +810,64 @@ class ThermostatController:
             except Exception as e:
                 logger.debug(f"Web interface update failed: {e}")
     
+    def _poll_sensors(self) -> None:
+        """Read the sensors every sensor_read_interval until stopped
+        
+        Runs in its own thread so the control loop, schedules and web
+        updates don't wait on 1-Wire conversions.
+        """
+        while True:
+            readings = self.read_sensors()
+            with self._readings_lock:
+                self._pending_readings = readings
+            if self._stop_polling.wait(self.sensor_read_interval):
+                return
+    
+    def _start_sensor_polling(self) -> None:
+        """Start the background sensor reader if it isn't running"""
+        if self._sensor_poller and self._sensor_poller.is_alive():
+            return
+        self._stop_polling.clear()
+        self._sensor_poller = threading.Thread(target=self._poll_sensors,
+                                               name='sensor-poller', daemon=True)
+        self._sensor_poller.start()
+    
+    def _take_sensor_readings(self) -> Optional[List[SensorReading]]:
+        """Get the latest batch of readings from the sensor reader
+        
+        Returns:
+            Readings not yet handed out, or None if there is no new batch
+        """
+        with self._readings_lock:
+            readings = self._pending_readings
+            self._pending_readings = None
+        return readings
+    
     def run(self) -> None:
         """Main control loop"""
         logger.info("Starting thermostat control loop")
+        self._start_sensor_polling()
         
         try:
             while True:
                 now = datetime.now()
+                tick = time.monotonic()
                 
                 # Check schedules (every minute)
-                if (now - self.last_schedule_check).total_seconds() >= 60:
+                if tick - self.last_schedule_check >= 60:
                     self._check_schedules(now)
-                    self.last_schedule_check = now
+                    self.last_schedule_check = tick
                 
-                # Read sensors
-                if (now - self.last_sensor_read).total_seconds() >= self.sensor_read_interval:
-                    readings = self.read_sensors()
-                    
+                # Handle a new batch of sensor readings, if there is one
+                readings = self._take_sensor_readings()
+                if readings is not None:
                     if readings:
                         # Update history and detect anomalies
-                        self.update_sensor_history(readings)
-                        self.detect_anomalies(readings)
+                        self.update_sensor_history(readings, now)
+                        valid_temps = self.detect_anomalies(readings, now)
                         
                         # Calculate system temperature
-                        system_temp = self.calculate_system_temperature(readings)
+                        system_temp = self.calculate_system_temperature(readings, now, valid_temps)
                         
                         # Store latest readings for web interface
                         self.latest_readings = readings
@@ -719,19 +878,19 @@ class ThermostatController:
                             self.control_hvac(system_temp)
                         
                         # Log sensor readings to database
-                        if self.db and (now - self.last_history_log).total_seconds() >= self.history_log_interval:
+                        if self.db and tick - self.last_history_log >= self.history_log_interval:
                             self._log_sensor_history(readings)
                             self._log_hvac_history(system_temp)
-                            self.last_history_log = now
+                            self.last_history_log = tick
                         
                         # Clean up old history once per day
-                        if self.db and (now - self.last_cleanup).total_seconds() >= 86400:  # 24 hours
+                        if self.db and tick - self.last_cleanup >= 86400:  # 24 hours
                             logger.info("Running daily database cleanup...")
                             try:
                                 self.db.smart_cleanup(self.history_retention_days, self.history_max_disk_percent)
                             except Exception as e:
                                 logger.error(f"Database cleanup failed: {e}")
-                            self.last_cleanup = now
+                            self.last_cleanup = tick
                         
                         # Update web interface
                         self._update_web_interface()
@@ -741,8 +900,6 @@ class ThermostatController:
                         logger.info(f"System temp: {system_temp:.1f}°F, "
                                    f"HVAC: {status['hvac_state']}, "
                                    f"Compromised sensors: {len(status['compromised_sensors'])}")
-                    
-                    self.last_sensor_read = now
                 
                 # Sleep to prevent CPU spinning
                 time.sleep(1)
@@ -755,6 +912,9 @@ class ThermostatController:
     def cleanup(self) -> None:
         """Clean up resources"""
         logger.info("Cleaning up...")
+        if self._sensor_poller:
+            self._stop_polling.set()
+            self._sensor_poller.join(timeout=5)
         if GPIO:
             # Turn off all stage relays
             for stage in self.heating_stages:
@@ -764,6 +924,8 @@ class ThermostatController:
             # Turn off fan
             GPIO.output(self.fan_gpio_pin, GPIO.LOW)
             GPIO.cleanup()
+        if self.db:
+            self.db.close()
         logger.info("Cleanup complete")
     
     def _check_schedules(self, current_time: datetime) -> None:
@@ -777,7 +939,7 @@ class ThermostatController:
         
         # Check if there's an active manual hold
         if self.schedule_hold_until and current_time < self.schedule_hold_until:
-            logger.debug(f"Schedules on hold until {self.schedule_hold_until}")
+            logger.debug("Schedules on hold until %s", self.schedule_hold_until)
             return
         
         # Clear expired hold
@@ -789,26 +951,30 @@ class ThermostatController:
         
         for schedule in active_schedules:
             logger.info(f"Applying schedule: {schedule['name']}")
+            source = f"schedule:{schedule['name']}"
+            changes = []
             
             # Apply temperature changes
             if schedule['target_temp_heat'] is not None:
                 old_temp = self.target_temp_heat
                 self.target_temp_heat = schedule['target_temp_heat']
-                self.db.log_setting_change('target_temp_heat', str(old_temp), 
-                                          str(self.target_temp_heat), f"schedule:{schedule['name']}")
+                changes.append(('target_temp_heat', str(old_temp),
+                                str(self.target_temp_heat), source))
             
             if schedule['target_temp_cool'] is not None:
                 old_temp = self.target_temp_cool
                 self.target_temp_cool = schedule['target_temp_cool']
-                self.db.log_setting_change('target_temp_cool', str(old_temp), 
-                                          str(self.target_temp_cool), f"schedule:{schedule['name']}")
+                changes.append(('target_temp_cool', str(old_temp),
+                                str(self.target_temp_cool), source))
             
             # Apply mode change
             if schedule['hvac_mode'] is not None:
                 old_mode = self.hvac_mode
                 self.hvac_mode = schedule['hvac_mode']
-                self.db.log_setting_change('hvac_mode', old_mode, 
-                                          self.hvac_mode, f"schedule:{schedule['name']}")
+                changes.append(('hvac_mode', old_mode, self.hvac_mode, source))
+            
+            # Log all changes for this schedule in one transaction
+            self.db.log_setting_changes_batch(changes)
             
             # Persist changes
             self.db.save_settings(self.target_temp_heat, self.target_temp_cool, 
@@ -827,7 +993,7 @@ class ThermostatController:
             for r in readings
         ]
         self.db.log_sensor_readings_batch(batch_data)
-        logger.debug(f"Logged {len(readings)} sensor readings to history")
+        logger.debug("Logged %d sensor readings to history", len(readings))
     
     def _log_hvac_history(self, system_temp: Optional[float]) -> None:
         """Log HVAC state to database with active stage information"""
@@ -12,7 +12,7 @@ from flask import Flask, render_template, jsonify, request
 from threading import Thread, Lock
 
 # Import temperature conversion utilities
-from temperature_utils import convert_temperature, get_unit_symbol
+from temperature_utils import convert_temperature, convert_temperatures, get_unit_symbol
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.urandom(24)
@@ -94,14 +94,13 @@ def convert_state_temperatures(state: Dict, to_units: str) -> Dict:
     
     # Convert sensor readings
     if 'sensor_readings' in state:
-        converted['sensor_readings'] = []
-        for reading in state['sensor_readings']:
-            converted_reading = reading.copy()
-            if 'temperature' in reading and reading['temperature'] is not None:
-                converted_reading['temperature'] = convert_temperature(
-                    reading['temperature'], 'C', to_units
-                )
-            converted['sensor_readings'].append(converted_reading)
+        readings = [reading.copy() for reading in state['sensor_readings']]
+        measured = [reading for reading in readings if 'temperature' in reading]
+        temperatures = convert_temperatures(
+            [reading['temperature'] for reading in measured], 'C', to_units)
+        for reading, temperature in zip(measured, temperatures):
+            reading['temperature'] = temperature
+        converted['sensor_readings'] = readings
     
     # Add unit info to state
     converted['temperature_units'] = to_units
@@ -455,9 +454,10 @@ def api_sensor_history():
         history = database.get_sensor_history(sensor_id=sensor_id, hours=hours, limit=limit)
         
         # Convert temperatures in history
-        for entry in history:
-            if 'temperature' in entry and entry['temperature'] is not None:
-                entry['temperature'] = convert_temperature(entry['temperature'], 'C', units)
+        temperatures = convert_temperatures(
+            [entry['temperature'] for entry in history], 'C', units)
+        for entry, temperature in zip(history, temperatures):
+            entry['temperature'] = temperature
         
         return jsonify({
             'history': history,
@@ -481,17 +481,13 @@ def api_hvac_history():
         
         history = database.get_hvac_history(hours=hours, limit=limit)
         
-        # Convert temperatures in history
-        for entry in history:
-            if 'system_temp' in entry and entry['system_temp'] is not None:
-                entry['system_temp'] = convert_temperature(entry['system_temp'], 'C', units)
-            if 'target_temp_heat' in entry and entry['target_temp_heat'] is not None:
-                entry['target_temp_heat'] = convert_temperature(entry['target_temp_heat'], 'C', units)
-            if 'target_temp_cool' in entry and entry['target_temp_cool'] is not None:
-                entry['target_temp_cool'] = convert_temperature(entry['target_temp_cool'], 'C', units)
-            # Handle legacy target_temp field if it exists
-            if 'target_temp' in entry and entry['target_temp'] is not None:
-                entry['target_temp'] = convert_temperature(entry['target_temp'], 'C', units)
+        # Convert temperatures in history, one column at a time (including
+        # the legacy target_temp field if it exists)
+        for field in ('system_temp', 'target_temp_heat', 'target_temp_cool', 'target_temp'):
+            entries = [entry for entry in history if field in entry]
+            temperatures = convert_temperatures([entry[field] for entry in entries], 'C', units)
+            for entry, temperature in zip(entries, temperatures):
+                entry[field] = temperature
         
         return jsonify({
             'history': history,
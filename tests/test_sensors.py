@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 """
 Test script for DS18B20 temperature sensors
+
+Usage: python test_sensors.py [--fast]
+  --fast  Read at 9-bit resolution (~94 ms per conversion instead of 750 ms)
 """
 
+import os
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     from w1thermsensor import W1ThermSensor, Sensor
@@ -13,8 +18,122 @@ except ImportError:
     print("Install with: pip install w1thermsensor")
     sys.exit(1)
 
+# Writing "trigger" here starts a conversion on every sensor on the bus at once
+W1_BULK_READ = '/sys/bus/w1/devices/w1_bus_master1/therm_bulk_read'
+
+
+def trigger_bulk_conversion() -> bool:
+    """Start a simultaneous temperature conversion on all sensors
+    
+    Needs a kernel whose w1_therm driver exposes therm_bulk_read. The write
+    returns once the conversion is done, so the per-sensor reads that follow
+    only transfer the scratchpad instead of each waiting ~750 ms.
+    
+    Returns:
+        True if the bulk conversion was triggered
+    """
+    try:
+        with open(W1_BULK_READ, 'w') as f:
+            f.write('trigger\n')
+        return True
+    except OSError:
+        return False
+
+
+def open_w1_slave(sensor):
+    """Open a sensor's w1_slave file once so it can be re-read cheaply
+    
+    Args:
+        sensor: W1ThermSensor instance
+        
+    Returns:
+        File descriptor, or None if the file cannot be opened
+    """
+    try:
+        return os.open(str(sensor.sensorpath), os.O_RDONLY)
+    except (AttributeError, OSError):
+        return None
+
+
+def read_w1_slave(fd: int) -> float:
+    """Read the temperature from an open w1_slave descriptor
+    
+    Reading from offset 0 makes the driver produce a fresh reading, in the
+    format "... crc=xx YES\n... t=23125\n".
+    
+    Args:
+        fd: Descriptor returned by open_w1_slave()
+        
+    Returns:
+        Temperature in Celsius
+        
+    Raises:
+        ValueError: If the CRC check failed
+    """
+    buf = os.pread(fd, 128, 0)
+    if b'YES' not in buf:
+        raise ValueError("CRC check failed")
+    return int(buf[buf.rfind(b't=') + 2:]) / 1000
+
+
+def read_temperature(sensor, fd=None):
+    """Read one sensor, returning the exception instead of raising it
+    
+    Args:
+        sensor: W1ThermSensor instance
+        fd: Optional open w1_slave descriptor to read directly
+        
+    Returns:
+        Temperature in Celsius, or the exception raised by the read
+    """
+    try:
+        if fd is not None:
+            return read_w1_slave(fd)
+        return sensor.get_temperature()
+    except Exception as e:
+        return e
+
+
+def set_fast_resolution(sensors) -> dict:
+    """Drop sensors to 9-bit resolution for faster conversions
+    
+    A 9-bit conversion takes ~94 ms instead of 750 ms at 12-bit, at the cost
+    of 0.5°C steps. The change is not persisted to the sensor EEPROM.
+    
+    Args:
+        sensors: List of W1ThermSensor instances
+        
+    Returns:
+        Dict of sensor ID to original resolution, for restore_resolution()
+    """
+    original = {}
+    for sensor in sensors:
+        try:
+            original[sensor.id] = sensor.get_resolution()
+            sensor.set_resolution(9, persist=False)
+        except Exception as e:
+            print(f"  {sensor.id}: could not set 9-bit resolution - {e}")
+    return original
+
+
+def restore_resolution(sensors, original: dict) -> None:
+    """Put sensors back to the resolution they had before the test
+    
+    Args:
+        sensors: List of W1ThermSensor instances
+        original: Dict returned by set_fast_resolution()
+    """
+    for sensor in sensors:
+        if sensor.id in original:
+            try:
+                sensor.set_resolution(original[sensor.id], persist=False)
+            except Exception as e:
+                print(f"  {sensor.id}: could not restore resolution - {e}")
+
 
 def main():
+    fast = '--fast' in sys.argv
+    
     print("=" * 60)
     print("DS18B20 Temperature Sensor Test")
     print("=" * 60)
@@ -44,6 +163,13 @@ def main():
     print(f"Found {len(sensors)} sensor(s):")
     print()
     
+    # Optional quick mode: 9-bit conversions, restored when the test ends
+    original_resolution = {}
+    if fast:
+        print("Fast mode: using 9-bit resolution (0.5°C steps)")
+        print()
+        original_resolution = set_fast_resolution(sensors)
+    
     # Display each sensor
     for i, sensor in enumerate(sensors, 1):
         print(f"Sensor #{i}")
@@ -65,22 +191,46 @@ def main():
     print("=" * 60)
     print()
     
+    # Sensor reads block in the kernel driver, so run them side by side
+    executor = ThreadPoolExecutor(max_workers=len(sensors))
+    
+    # Keep each sysfs file open for the whole loop instead of re-opening it
+    fds = [open_w1_slave(sensor) for sensor in sensors]
+    
     try:
         while True:
             print(f"\n[{time.strftime('%H:%M:%S')}]")
             
-            for sensor in sensors:
-                try:
-                    temp_c = sensor.get_temperature()
-                    temp_f = (temp_c * 9/5) + 32
-                    print(f"  {sensor.id}: {temp_f:.1f}°F ({temp_c:.1f}°C)")
-                except Exception as e:
-                    print(f"  {sensor.id}: ERROR - {e}")
+            if len(sensors) > 1:
+                trigger_bulk_conversion()
+            
+            temps_c = []
+            results = executor.map(read_temperature, sensors, fds)
+            for sensor, result in zip(sensors, results):
+                if isinstance(result, Exception):
+                    print(f"  {sensor.id}: ERROR - {result}")
+                    continue
+                temp_c = result
+                temps_c.append(temp_c)
+                temp_f = (temp_c * 9/5) + 32
+                print(f"  {sensor.id}: {temp_f:.1f}°F ({temp_c:.1f}°C)")
+            
+            # Average from the values already read; don't touch the bus again
+            if len(temps_c) > 1:
+                avg_c = sum(temps_c) / len(temps_c)
+                avg_f = (avg_c * 9/5) + 32
+                print(f"  Average: {avg_f:.1f}°F ({avg_c:.1f}°C)")
             
             time.sleep(5)
     
     except KeyboardInterrupt:
         print("\n\nTest complete!")
+    finally:
+        executor.shutdown(wait=False)
+        for fd in fds:
+            if fd is not None:
+                os.close(fd)
+        restore_resolution(sensors, original_resolution)
 
 
 if __name__ == '__main__':
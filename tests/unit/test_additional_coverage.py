@@ -7,6 +7,7 @@ Tests sensor reading paths, main loop logic, and edge cases
 import unittest
 import os
 import tempfile
+import time
 from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock, PropertyMock
 import sys
@@ -92,6 +93,73 @@ class TestSensorReadingPaths(unittest.TestCase):
                 
                 self.assertEqual(len(readings), 0)
     
+    def test_read_sensors_uses_bulk_conversion(self):
+        """Test all sensors are converted at once before being read"""
+        with tempfile.TemporaryDirectory() as bus_dir:
+            bulk_read = os.path.join(bus_dir, 'therm_bulk_read')
+            with open(bulk_read, 'w') as f:
+                f.write('0\n')
+            
+            def get_temperature():
+                # The conversion has been triggered before any sensor is read
+                with open(bulk_read) as f:
+                    self.assertEqual(f.read(), 'trigger\n')
+                return 21.5
+            
+            sensors = [MagicMock(id='sensor1'), MagicMock(id='sensor2')]
+            for sensor in sensors:
+                sensor.get_temperature.side_effect = get_temperature
+            mock_w1 = MagicMock()
+            mock_w1.get_available_sensors.return_value = sensors
+            
+            with patch('thermostat.GPIO', None), \
+                 patch('thermostat.W1ThermSensor', mock_w1), \
+                 patch('thermostat.W1_BULK_READ_GLOB', bulk_read):
+                controller = ThermostatController()
+                readings = controller.read_sensors()
+        
+        self.assertEqual([r.sensor_id for r in readings], ['sensor1', 'sensor2'])
+        self.assertEqual([r.temperature for r in readings], [21.5, 21.5])
+    
+    def test_read_sensors_without_bulk_conversion(self):
+        """Test sensors are read one by one when bulk reads aren't available"""
+        sensor = MagicMock(id='sensor1')
+        sensor.get_temperature.return_value = 20.0
+        mock_w1 = MagicMock()
+        mock_w1.get_available_sensors.return_value = [sensor]
+        
+        with patch('thermostat.GPIO', None), \
+             patch('thermostat.W1ThermSensor', mock_w1), \
+             patch('thermostat.W1_BULK_READ_GLOB', '/nonexistent/therm_bulk_read'):
+            controller = ThermostatController()
+            self.assertFalse(controller._start_bulk_conversion())
+            readings = controller.read_sensors()
+        
+        self.assertEqual(len(readings), 1)
+        self.assertEqual(readings[0].temperature, 20.0)
+    
+    def test_sensor_poller_hands_over_each_batch_once(self):
+        """Test background sensor reads are picked up once by the control loop"""
+        with patch('thermostat.GPIO', None):
+            controller = ThermostatController()
+        reading = SensorReading('sensor1', 'Living Room', 21.0, datetime.now())
+        
+        with patch.object(controller, 'read_sensors', return_value=[reading]):
+            self.assertIsNone(controller._take_sensor_readings())
+            controller._start_sensor_polling()
+            
+            deadline = time.monotonic() + 5
+            readings = None
+            while readings is None and time.monotonic() < deadline:
+                readings = controller._take_sensor_readings()
+                time.sleep(0.01)
+            
+            self.assertEqual(readings, [reading])
+            self.assertIsNone(controller._take_sensor_readings())
+            
+            controller.cleanup()
+        self.assertFalse(controller._sensor_poller.is_alive())
+    
     def test_detect_anomalies_with_single_sensor(self):
         """Test anomaly detection with only one sensor"""
         with patch('thermostat.GPIO', None):
@@ -6,9 +6,12 @@ Tests persistence, schedules, and history logging
 
 import unittest
 import os
+import sqlite3
 import tempfile
+import threading
 from datetime import datetime, time, timedelta
 from pathlib import Path
+from unittest.mock import patch
 import sys
 
 # Add src to path for imports
@@ -91,6 +94,497 @@ class TestDatabaseInitialization(unittest.TestCase):
             indexes = [row[0] for row in cursor.fetchall()]
             self.assertIn('idx_sensor_history_timestamp', indexes)
             self.assertIn('idx_setting_history_timestamp', indexes)
+    
+    def test_sensor_history_read_uses_covering_index(self):
+        """Test that sensor history is read from the indexes alone"""
+        with self.db._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                EXPLAIN QUERY PLAN
+                SELECT id, sensor_id, sensor_name, temperature, is_compromised, timestamp
+                FROM sensor_history WHERE sensor_id = ? AND timestamp > ?
+                ORDER BY timestamp DESC
+            ''', ('sensor1', '2024-01-01 00:00:00'))
+            plan = ' '.join(row[3] for row in cursor.fetchall())
+            self.assertIn('COVERING INDEX idx_sensor_history_cover', plan)
+            
+            cursor.execute('''
+                EXPLAIN QUERY PLAN
+                SELECT id, sensor_id, sensor_name, temperature, is_compromised, timestamp
+                FROM sensor_history WHERE timestamp > ?
+                ORDER BY timestamp DESC
+            ''', ('2024-01-01 00:00:00',))
+            plan = ' '.join(row[3] for row in cursor.fetchall())
+            self.assertIn('COVERING INDEX idx_sensor_history_timestamp', plan)
+    
+    def test_history_cutoffs_use_timestamp_index(self):
+        """Test that time-range history queries seek the timestamp indexes"""
+        with self.db._get_connection() as conn:
+            cursor = conn.cursor()
+            for table in ('sensor_history', 'hvac_history'):
+                cursor.execute(f'''
+                    EXPLAIN QUERY PLAN
+                    SELECT * FROM {table} WHERE timestamp > ?
+                    ORDER BY timestamp DESC LIMIT ?
+                ''', ('2024-01-01 00:00:00', 10))
+                plan = ' '.join(row[3] for row in cursor.fetchall())
+                self.assertIn(f'INDEX idx_{table}_timestamp (timestamp>?)', plan)
+    
+    def test_connection_pragmas(self):
+        """Test that connections use WAL with relaxed sync"""
+        with self.db._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            self.assertEqual(conn.isolation_level, 'IMMEDIATE')
+
+
+class TestConnectionManagement(unittest.TestCase):
+    """Test the shared long-lived connection"""
+    
+    def setUp(self):
+        """Create a temporary database for each test"""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db_path = self.temp_db.name
+        self.db = ThermostatDatabase(self.db_path)
+    
+    def tearDown(self):
+        """Clean up temporary database"""
+        self.db.close()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+    
+    def test_connection_reused(self):
+        """Test that calls share one connection"""
+        with self.db._get_connection() as first:
+            pass
+        with self.db._get_connection() as second:
+            pass
+        self.assertIs(first, second)
+    
+    def test_close_and_reopen(self):
+        """Test that the connection reopens after close()"""
+        self.db.log_sensor_reading('sensor1', 'Room1', 70.0, False)
+        self.db.close()
+        
+        history = self.db.get_sensor_history(hours=1)
+        self.assertEqual(len(history), 1)
+    
+    def test_concurrent_writes_from_threads(self):
+        """Test that the shared connection can be used from several threads"""
+        def writer(sensor_id):
+            for i in range(20):
+                self.db.log_sensor_reading(sensor_id, sensor_id, 70.0 + i, False)
+        
+        threads = [threading.Thread(target=writer, args=(f'sensor{n}',)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        history = self.db.get_sensor_history(hours=1, limit=1000)
+        self.assertEqual(len(history), 80)
+    
+    def test_reader_connections_are_read_only(self):
+        """Test that pooled reader connections refuse writes"""
+        with self.db._reader() as conn:
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM settings")
+    
+    def test_reads_do_not_wait_for_writer(self):
+        """Test that queries run while another thread holds the writer"""
+        self.db.log_setting_change('hvac_mode', 'off', 'heat')
+        results = []
+        
+        with self.db._get_connection():
+            reader = threading.Thread(
+                target=lambda: results.append(self.db.get_setting_history()))
+            reader.start()
+            reader.join(timeout=2)
+            self.assertFalse(reader.is_alive())
+        
+        self.assertEqual(len(results[0]), 1)
+    
+    def test_close_releases_readers(self):
+        """Test that close() closes idle readers and they reopen on demand"""
+        self.db.get_sensors()
+        self.assertEqual(self.db._reader_count, 1)
+        
+        self.db.close()
+        self.assertEqual(self.db._reader_count, 0)
+        
+        self.assertEqual(self.db.get_sensors(), [])
+
+
+class TestBufferedWrites(unittest.TestCase):
+    """Test batching of history writes"""
+    
+    def setUp(self):
+        """Create a temporary database for each test"""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db_path = self.temp_db.name
+        self.db = ThermostatDatabase(self.db_path)
+    
+    def tearDown(self):
+        """Clean up temporary database"""
+        self.db.close()
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+    
+    def _count_rows(self, table):
+        with self.db._get_connection() as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    
+    def test_writes_buffered_until_flush(self):
+        """Test that history rows are held in memory until flushed"""
+        self.db.log_sensor_reading('sensor1', 'Room1', 70.0, False)
+        self.db.log_hvac_state(70.0, 68.0, 74.0, 'heat', 'auto', True, False, True)
+        
+        self.assertEqual(self._count_rows('sensor_history'), 0)
+        self.assertEqual(self._count_rows('hvac_history'), 0)
+        
+        self.db.flush()
+        
+        self.assertEqual(self._count_rows('sensor_history'), 1)
+        self.assertEqual(self._count_rows('hvac_history'), 1)
+    
+    def test_flush_when_batch_full(self):
+        """Test that a full batch is written immediately"""
+        self.db.WRITE_BATCH_SIZE = 5
+        
+        for i in range(5):
+            self.db.log_sensor_reading('sensor1', 'Room1', 70.0 + i, False)
+        
+        self.assertEqual(self._count_rows('sensor_history'), 5)
+    
+    def test_flush_after_interval(self):
+        """Test that pending rows are written by the background timer"""
+        self.db.WRITE_FLUSH_INTERVAL = 0.05
+        self.db.log_sensor_reading('sensor1', 'Room1', 70.0, False)
+        
+        timer = self.db._flush_timer
+        self.assertIsNotNone(timer)
+        timer.join(timeout=2)
+        
+        self.assertEqual(self._count_rows('sensor_history'), 1)
+        self.assertIsNone(self.db._flush_timer)
+    
+    def test_flush_interval_configurable(self):
+        """Test the flush interval can be set per database"""
+        db = ThermostatDatabase(self.db_path, write_flush_interval=900)
+        try:
+            self.assertEqual(db.WRITE_FLUSH_INTERVAL, 900)
+            self.assertEqual(self.db.WRITE_FLUSH_INTERVAL, ThermostatDatabase.WRITE_FLUSH_INTERVAL)
+        finally:
+            db.close()
+    
+    def test_close_flushes_pending_rows(self):
+        """Test that closing the database writes buffered rows"""
+        self.db.log_sensor_readings_batch([
+            ('sensor1', 'Room1', 70.0, False),
+            ('sensor2', 'Room2', 71.0, True),
+        ])
+        self.db.close()
+        
+        conn = sqlite3.connect(self.db_path)
+        count = conn.execute('SELECT COUNT(*) FROM sensor_history').fetchone()[0]
+        conn.close()
+        self.assertEqual(count, 2)
+    
+    def test_timestamp_taken_when_logged(self):
+        """Test that buffered rows keep the time they were logged"""
+        self.db.log_sensor_reading('sensor1', 'Room1', 70.0, False)
+        queued_timestamp = self.db._sensor_queue[0][-1]
+        
+        history = self.db.get_sensor_history(hours=1)
+        self.assertEqual(history[0]['timestamp'], queued_timestamp + 'Z')
+    
+    def test_failed_flush_writes_nothing(self):
+        """Test that a flush failing partway rolls back the whole batch"""
+        self.db.log_sensor_reading('sensor1', 'Room1', 70.0, False)
+        self.db.log_hvac_state(70.0, 68.0, 74.0, 'heat', 'auto', True, False, True)
+        
+        with patch.object(ThermostatDatabase, '_SQL_INSERT_HVAC', 'INSERT INTO missing VALUES (?)'):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.db.flush()
+        
+        self.assertEqual(self._count_rows('sensor_history'), 0)
+    
+    def test_failed_flush_keeps_rows_for_retry(self):
+        """Test that rows from a failed flush are written by the next one"""
+        self.db.log_sensor_reading('sensor1', 'Room1', 70.0, False)
+        self.db.log_sensor_reading('sensor1', 'Room1', 71.0, False)
+        
+        with patch.object(ThermostatDatabase, '_SQL_INSERT_SENSOR', 'INSERT INTO missing VALUES (?)'):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.db.flush()
+        self.db.log_sensor_reading('sensor1', 'Room1', 72.0, False)
+        self.db.flush()
+        
+        with self.db._get_connection() as conn:
+            temps = [row[0] for row in conn.execute(
+                'SELECT temperature FROM sensor_history ORDER BY id')]
+        self.assertEqual(temps, [70.0, 71.0, 72.0])
+    
+    def test_concurrent_flushes_write_every_row_once(self):
+        """Test that flushes from several threads don't lose or repeat rows"""
+        errors = []
+        
+        def worker(offset):
+            try:
+                for i in range(50):
+                    self.db.log_sensor_reading('sensor1', 'Room1', offset + i, False)
+                    self.db.flush()
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=worker, args=(n * 100,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(self._count_rows('sensor_history'), 200)
+    
+    def test_timed_flush_failure_rearms_timer(self):
+        """Test that a failed background flush is retried"""
+        self.db.log_sensor_reading('sensor1', 'Room1', 70.0, False)
+        
+        with patch.object(ThermostatDatabase, '_SQL_INSERT_SENSOR', 'INSERT INTO missing VALUES (?)'):
+            self.db._timed_flush()
+        
+        self.assertEqual(len(self.db._sensor_queue), 1)
+        self.assertIsNotNone(self.db._flush_timer)
+        self.db.flush()
+        self.assertEqual(self._count_rows('sensor_history'), 1)
+
+
+class TestSchemaMigration(unittest.TestCase):
+    """Test upgrading databases created with an older schema"""
+    
+    def setUp(self):
+        """Create a database with the legacy hvac_history schema"""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db_path = self.temp_db.name
+        
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE hvac_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                system_temp REAL,
+                target_temp REAL,
+                hvac_mode TEXT,
+                heat_active INTEGER,
+                cool_active INTEGER,
+                fan_active INTEGER,
+                heat2_active INTEGER,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.executemany('''
+            INSERT INTO hvac_history
+                (system_temp, target_temp, hvac_mode, heat_active, cool_active, fan_active, heat2_active)
+            VALUES (?, ?, ?, 0, 0, 0, 0)
+        ''', [(20.0, 21.0, 'heat'), (25.0, 23.0, 'cool'), (22.0, 22.0, 'auto')])
+        conn.commit()
+        conn.close()
+    
+    def tearDown(self):
+        """Clean up temporary database"""
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+    
+    def test_legacy_hvac_history_migrated(self):
+        """Test that legacy target_temp is split into heat/cool setpoints"""
+        db = ThermostatDatabase(self.db_path)
+        
+        with db._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT hvac_mode, target_temp_heat, target_temp_cool, fan_mode
+                FROM hvac_history ORDER BY id
+            ''')
+            rows = [tuple(row) for row in cursor.fetchall()]
+        
+        self.assertEqual(rows, [
+            ('heat', 21.0, None, 'auto'),
+            ('cool', None, 23.0, 'auto'),
+            ('auto', 22.0, 22.0, 'auto'),
+        ])
+    
+    def test_active_stages_column_added(self):
+        """Test that active_stages column is added to hvac_history"""
+        db = ThermostatDatabase(self.db_path)
+        
+        with db._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT name FROM pragma_table_info('hvac_history')")
+            columns = [row[0] for row in cursor.fetchall()]
+        
+        self.assertIn('active_stages', columns)
+        self.assertNotIn('target_temp', columns)
+    
+    def test_history_autoincrement_removed(self):
+        """Test that history tables are rebuilt without AUTOINCREMENT"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE sensor_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sensor_id TEXT NOT NULL,
+                sensor_name TEXT NOT NULL,
+                temperature REAL NOT NULL,
+                is_compromised INTEGER DEFAULT 0,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute('CREATE INDEX idx_sensor_history_sensor_id ON sensor_history(sensor_id)')
+        conn.executemany(
+            'INSERT INTO sensor_history (id, sensor_id, sensor_name, temperature) VALUES (?, ?, ?, ?)',
+            [(5, 'sensor1', 'Room1', 20.0), (9, 'sensor1', 'Room1', 21.0)]
+        )
+        conn.commit()
+        conn.close()
+        
+        db = ThermostatDatabase(self.db_path)
+        
+        with db._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT name FROM sqlite_master
+                WHERE type = 'table' AND sql LIKE '%AUTOINCREMENT%'
+            ''')
+            self.assertEqual({row[0] for row in cursor.fetchall()}, {'schedules', 'hvac_stages'})
+            cursor.execute('SELECT id FROM sensor_history ORDER BY id')
+            self.assertEqual([row[0] for row in cursor.fetchall()], [5, 9])
+            cursor.execute("SELECT COUNT(*) FROM pragma_index_list('sensor_history')")
+            self.assertEqual(cursor.fetchone()[0], 2)  # timestamp and cover
+        stats = db.get_database_stats()
+        self.assertEqual(stats['sensor_history_count'], 2)
+        self.assertEqual(stats['hvac_history_count'], 3)
+    
+    def test_interrupted_upgrade_rolls_back(self):
+        """Test that an upgrade failing partway leaves the database reopenable"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE sensor_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sensor_id TEXT NOT NULL,
+                sensor_name TEXT NOT NULL,
+                temperature REAL NOT NULL,
+                is_compromised INTEGER DEFAULT 0,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.commit()
+        conn.close()
+        
+        def interrupted_copy(cursor, table, table_sql):
+            # Dies after creating the new table, before the rows are copied
+            cursor.execute(table_sql.replace(table, f'{table}_new', 1))
+            raise sqlite3.OperationalError("interrupted")
+        
+        with patch.object(ThermostatDatabase, '_rebuild_table', staticmethod(interrupted_copy)):
+            with self.assertRaises(sqlite3.OperationalError):
+                ThermostatDatabase(self.db_path)
+        
+        conn = sqlite3.connect(self.db_path)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertNotIn('sensor_history_new', tables)
+        self.assertNotIn('hvac_history_new', tables)
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], 0)
+        conn.close()
+        
+        db = ThermostatDatabase(self.db_path)
+        with db._get_connection() as conn:
+            self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], db.SCHEMA_VERSION)
+            rows = conn.execute('SELECT target_temp_heat FROM hvac_history ORDER BY id').fetchall()
+        self.assertEqual([row[0] for row in rows], [21.0, None, 22.0])
+        db.close()
+    
+    def test_days_mask_backfilled(self):
+        """Test that schedules from before days_mask existed get a mask"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE schedules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                enabled INTEGER DEFAULT 1,
+                days_of_week TEXT NOT NULL,
+                time TEXT NOT NULL,
+                target_temp_heat REAL,
+                target_temp_cool REAL,
+                hvac_mode TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute('''
+            INSERT INTO schedules (name, days_of_week, time, target_temp_heat)
+            VALUES ('Weekend', 'Sat,Sun', '08:00', 20.0)
+        ''')
+        conn.commit()
+        conn.close()
+        
+        db = ThermostatDatabase(self.db_path)
+        
+        sunday_8am = datetime(2024, 1, 7, 8, 0)
+        active = db.get_active_schedules(sunday_8am)
+        self.assertEqual(len(active), 1)
+        self.assertEqual(active[0]['name'], 'Weekend')
+    
+    def test_narrow_timestamp_index_rebuilt(self):
+        """Test that the old single-column sensor timestamp index is widened"""
+        ThermostatDatabase(self.db_path).close()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('DROP INDEX idx_sensor_history_timestamp')
+        conn.execute('CREATE INDEX idx_sensor_history_timestamp ON sensor_history(timestamp)')
+        conn.execute('PRAGMA user_version = 0')  # as written by older versions
+        conn.commit()
+        conn.close()
+        
+        db = ThermostatDatabase(self.db_path)
+        with db._get_connection() as conn:
+            columns = [row[0] for row in conn.execute(
+                "SELECT name FROM pragma_index_info('idx_sensor_history_timestamp')")]
+        
+        self.assertEqual(columns[0], 'timestamp')
+        self.assertIn('temperature', columns)
+    
+    def test_schema_version_recorded(self):
+        """Test that a migrated database skips the upgrade on later opens"""
+        ThermostatDatabase(self.db_path).close()
+        
+        with patch.object(ThermostatDatabase, '_upgrade_schema') as upgrade:
+            db = ThermostatDatabase(self.db_path)
+        
+        upgrade.assert_not_called()
+        with db._get_connection() as conn:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+        self.assertEqual(version, ThermostatDatabase.SCHEMA_VERSION)
+    
+    def test_current_schema_skips_ddl(self):
+        """Test that opening a current database doesn't re-run the schema DDL"""
+        db = ThermostatDatabase(self.db_path)
+        statements = []
+        db._conn.set_trace_callback(statements.append)
+        
+        db._init_database()
+        
+        self.assertFalse([sql for sql in statements if 'CREATE' in sql])
+        db.close()
+    
+    def test_existing_history_counted(self):
+        """Test that rows from before the count triggers existed are counted"""
+        db = ThermostatDatabase(self.db_path)
+        
+        stats = db.get_database_stats()
+        self.assertEqual(stats['hvac_history_count'], 3)
 
 
 class TestSettingsPersistence(unittest.TestCase):
@@ -151,6 +645,80 @@ class TestSettingsPersistence(unittest.TestCase):
         self.assertIsInstance(updated_at, datetime)
 
 
+class TestReadCaches(unittest.TestCase):
+    """Test in-memory caching of settings and schedules"""
+    
+    def setUp(self):
+        """Create a temporary database for each test"""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db_path = self.temp_db.name
+        self.db = ThermostatDatabase(self.db_path)
+    
+    def tearDown(self):
+        """Clean up temporary database"""
+        if os.path.exists(self.db_path):
+            os.unlink(self.db_path)
+    
+    def test_load_settings_served_from_cache(self):
+        """Test that saved settings are returned without re-reading the database"""
+        self.db.save_settings(68.0, 74.0, 'heat', 'auto', 'C')
+        
+        with patch.object(self.db, '_read_settings') as mock_read:
+            settings = self.db.load_settings()
+            mock_read.assert_not_called()
+        
+        self.assertEqual(settings['target_temp_heat'], 68.0)
+        self.assertEqual(settings['temperature_units'], 'C')
+    
+    def test_load_settings_returns_copy(self):
+        """Test that modifying loaded settings does not affect the cache"""
+        self.db.save_settings(68.0, 74.0, 'heat')
+        
+        settings = self.db.load_settings()
+        settings['hvac_mode'] = 'off'
+        
+        self.assertEqual(self.db.load_settings()['hvac_mode'], 'heat')
+    
+    def test_invalidate_settings_cache(self):
+        """Test that invalidating picks up changes made outside the instance"""
+        self.db.save_settings(68.0, 74.0, 'heat')
+        
+        with self.db._get_connection() as conn:
+            conn.execute("UPDATE settings SET hvac_mode = 'cool' WHERE id = 1")
+        
+        self.assertEqual(self.db.load_settings()['hvac_mode'], 'heat')
+        self.db.invalidate_settings_cache()
+        self.assertEqual(self.db.load_settings()['hvac_mode'], 'cool')
+    
+    def test_schedule_writes_refresh_cache(self):
+        """Test that create, update and delete are reflected in cached reads"""
+        schedule_id = self.db.create_schedule("Morning", "Mon", "06:00", 68.0)
+        self.assertEqual(len(self.db.get_schedules(enabled_only=True)), 1)
+        
+        self.db.update_schedule(schedule_id, enabled=False)
+        self.assertEqual(len(self.db.get_schedules(enabled_only=True)), 0)
+        self.assertEqual(len(self.db.get_schedules()), 1)
+        
+        self.db.delete_schedule(schedule_id)
+        self.assertEqual(len(self.db.get_schedules()), 0)
+    
+    def test_get_schedules_served_from_cache(self):
+        """Test that repeated schedule reads don't query the database"""
+        self.db.create_schedule("Morning", "Mon,Tue", "06:00", 68.0)
+        self.assertEqual(len(self.db.get_schedules()), 1)
+        
+        with patch.object(self.db, '_read_schedules') as mock_read:
+            schedules = self.db.get_schedules()
+            mock_read.assert_not_called()
+        
+        self.assertEqual(schedules[0]['name'], 'Morning')
+        
+        # Returned rows are copies
+        schedules[0]['name'] = 'Changed'
+        self.assertEqual(self.db.get_schedules()[0]['name'], 'Morning')
+
+
 class TestScheduleCRUD(unittest.TestCase):
     """Test schedule create, read, update, delete operations"""
     
@@ -180,6 +748,39 @@ class TestScheduleCRUD(unittest.TestCase):
         self.assertIsNotNone(schedule_id)
         self.assertGreater(schedule_id, 0)
     
+    def test_create_schedule_ids_without_returning(self):
+        """Test schedule ids on SQLite builds without INSERT ... RETURNING"""
+        first = self.db.create_schedule("Morning", "1,2,3,4,5", "06:00", 68.0)
+        with patch('database.RETURNING_SUPPORTED', False):
+            second = self.db.create_schedule("Evening", "1,2,3,4,5", "18:00", 70.0)
+        
+        self.assertEqual(second, first + 1)
+        names = {s['id']: s['name'] for s in self.db.get_schedules()}
+        self.assertEqual(names[second], "Evening")
+    
+    def test_create_schedules_bulk(self):
+        """Test creating several schedules in one call"""
+        ids = self.db.create_schedules_bulk([
+            ("Morning", "Mon,Tue,Wed,Thu,Fri", "06:00", 68.0, None, "heat"),
+            ("Evening", "Sat,Sun", "18:00"),
+        ])
+    
+        self.assertEqual(len(ids), 2)
+        schedules = {s['id']: s for s in self.db.get_schedules()}
+        self.assertEqual(schedules[ids[0]]['target_temp_heat'], 68.0)
+        self.assertEqual(schedules[ids[1]]['name'], "Evening")
+        self.assertEqual(schedules[ids[1]]['days_mask'], 0b1100000)
+    
+    def test_create_schedules_bulk_is_atomic(self):
+        """Test that a failing schedule rolls back the whole batch"""
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.create_schedules_bulk([
+                ("Morning", "1,2,3,4,5", "06:00"),
+                (None, "1,2,3,4,5", "18:00"),
+            ])
+    
+        self.assertEqual(self.db.get_schedules(), [])
+    
     def test_get_all_schedules(self):
         """Test retrieving all schedules"""
         # Create multiple schedules
@@ -225,6 +826,30 @@ class TestScheduleCRUD(unittest.TestCase):
         self.assertEqual(schedule['time'], '05:30')
         self.assertEqual(schedule['target_temp_heat'], 69.0)
     
+    def test_update_schedule_clears_field_with_none(self):
+        """Test that an explicit None clears a field and others are untouched"""
+        schedule_id = self.db.create_schedule(
+            "Morning", "1,2,3,4,5", "06:00", 20.0, 24.0, "auto"
+        )
+        
+        self.db.update_schedule(schedule_id, target_temp_cool=None)
+        
+        schedule = [s for s in self.db.get_schedules() if s['id'] == schedule_id][0]
+        self.assertIsNone(schedule['target_temp_cool'])
+        self.assertEqual(schedule['target_temp_heat'], 20.0)
+        self.assertEqual(schedule['name'], 'Morning')
+        self.assertEqual(schedule['hvac_mode'], 'auto')
+    
+    def test_update_schedule_sets_utc_updated_at(self):
+        """Test that updated_at is stamped by SQLite like other tables"""
+        schedule_id = self.db.create_schedule("Morning", "1,2,3,4,5", "06:00", 20.0)
+        
+        self.db.update_schedule(schedule_id, time="06:30")
+        
+        schedule = [s for s in self.db.get_schedules() if s['id'] == schedule_id][0]
+        updated_at = datetime.strptime(schedule['updated_at'], '%Y-%m-%d %H:%M:%S')
+        self.assertLess(abs((datetime.utcnow() - updated_at).total_seconds()), 60)
+    
     def test_delete_schedule(self):
         """Test deleting a schedule"""
         schedule_id = self.db.create_schedule(
@@ -290,6 +915,45 @@ class TestScheduleCRUD(unittest.TestCase):
         self.assertEqual(len(active), 1)
         self.assertEqual(active[0]['name'], 'Evening')
     
+    def test_active_schedules_match_day_names(self):
+        """Test that day names, full names and numbers all match"""
+        self.db.create_schedule("Names", "Mon,Wed", "06:00", 68.0)
+        self.db.create_schedule("Full names", "monday", "06:00", 69.0)
+        self.db.create_schedule("Numbers", "0,2", "06:00", 70.0)
+        self.db.create_schedule("Other days", "Tue,Thu,6", "06:00", 71.0)
+        
+        monday_6am = datetime(2024, 1, 1, 6, 0)
+        names = {s['name'] for s in self.db.get_active_schedules(monday_6am)}
+        self.assertEqual(names, {'Names', 'Full names', 'Numbers'})
+    
+    def test_active_schedules_follow_day_changes(self):
+        """Test that updating or deleting a schedule updates its days"""
+        schedule_id = self.db.create_schedule("Morning", "Mon", "06:00", 68.0)
+        monday_6am = datetime(2024, 1, 1, 6, 0)
+        tuesday_6am = datetime(2024, 1, 2, 6, 0)
+        
+        self.db.update_schedule(schedule_id, days_of_week="Tue")
+        self.assertEqual(len(self.db.get_active_schedules(monday_6am)), 0)
+        self.assertEqual(len(self.db.get_active_schedules(tuesday_6am)), 1)
+        
+        self.db.delete_schedule(schedule_id)
+        self.assertEqual(len(self.db.get_active_schedules(tuesday_6am)), 0)
+    
+    def test_days_mask_stored(self):
+        """Test that days_of_week is encoded as a weekday bitmask"""
+        schedule_id = self.db.create_schedule("Weekend", "Sat,Sun", "08:00", 20.0)
+        self.assertEqual(self.db.get_schedules()[0]['days_mask'], 0b1100000)
+        
+        self.db.update_schedule(schedule_id, days_of_week="0,2")
+        self.assertEqual(self.db.get_schedules()[0]['days_mask'], 0b0000101)
+    
+    def test_active_schedules_ignore_digits_in_time(self):
+        """Test that a day number is not matched against the time string"""
+        self.db.create_schedule("Ten", "6", "10:00", 20.0)
+        
+        monday_10am = datetime(2024, 1, 1, 10, 0)
+        self.assertEqual(self.db.get_active_schedules(monday_10am), [])
+    
     def test_no_active_schedules_at_time(self):
         """Test when no schedules match the current time"""
         self.db.create_schedule("Morning", "1,2,3,4,5", "06:00", 68.0, None, "heat")
@@ -364,6 +1028,21 @@ class TestHistoryLogging(unittest.TestCase):
         self.assertEqual(history[0]['target_temp_cool'], 75.0)
         self.assertEqual(history[0]['fan_mode'], 'auto')
     
+    def test_log_hvac_state_skips_repeats(self):
+        """Test that an unchanged HVAC state is only logged on the heartbeat"""
+        for temp in (72.0, 72.1, 71.9):  # all round to 72.0
+            self.db.log_hvac_state(temp, 68.0, 75.0, 'heat', 'auto', True, False, True)
+        self.assertEqual(len(self.db.get_hvac_history(hours=1)), 1)
+        
+        # A relay change is logged straight away
+        self.db.log_hvac_state(72.0, 68.0, 75.0, 'heat', 'auto', False, False, True)
+        self.assertEqual(len(self.db.get_hvac_history(hours=1)), 2)
+        
+        # The same state again once the heartbeat interval has passed
+        self.db._last_hvac_logged -= ThermostatDatabase.HVAC_HEARTBEAT_INTERVAL
+        self.db.log_hvac_state(72.0, 68.0, 75.0, 'heat', 'auto', False, False, True)
+        self.assertEqual(len(self.db.get_hvac_history(hours=1)), 3)
+    
     def test_log_setting_change(self):
         """Test logging setting changes with audit trail"""
         self.db.log_setting_change('target_temp_heat', '68', '70', 'web_interface')
@@ -375,6 +1054,28 @@ class TestHistoryLogging(unittest.TestCase):
         self.assertEqual(history[0]['new_value'], '70')
         self.assertEqual(history[0]['source'], 'web_interface')
     
+    def test_batch_log_setting_changes(self):
+        """Test logging multiple setting changes at once"""
+        changes = [
+            ('target_temp_heat', '68', '70', 'schedule:Morning'),
+            ('target_temp_cool', '74', '76', 'schedule:Morning'),
+            ('hvac_mode', 'heat', 'auto', 'schedule:Morning'),
+        ]
+        
+        self.db.log_setting_changes_batch(changes)
+        
+        history = self.db.get_setting_history(limit=100)
+        self.assertEqual(len(history), 3)
+        names = {h['setting_name'] for h in history}
+        self.assertEqual(names, {'target_temp_heat', 'target_temp_cool', 'hvac_mode'})
+        self.assertTrue(all(h['source'] == 'schedule:Morning' for h in history))
+    
+    def test_batch_log_setting_changes_empty(self):
+        """Test that an empty batch is a no-op"""
+        self.db.log_setting_changes_batch([])
+        
+        self.assertEqual(len(self.db.get_setting_history()), 0)
+    
     def test_get_sensor_history_time_filter(self):
         """Test filtering sensor history by time range"""
         # Log readings at different times
@@ -382,6 +1083,7 @@ class TestHistoryLogging(unittest.TestCase):
         
         # Reading from 2 hours ago
         self.db.log_sensor_reading('sensor1', 'Room1', 70.0, False)
+        self.db.flush()
         
         # Manually adjust timestamp in database to simulate older reading
         with self.db._get_connection() as conn:
@@ -424,6 +1126,55 @@ class TestHistoryLogging(unittest.TestCase):
         temps = [r['temperature'] for r in history]
         self.assertIn(79.0, temps)  # Last reading
         self.assertIn(75.0, temps)  # 5th from last
+    
+    def test_get_sensor_history_columns(self):
+        """Test column-oriented history matches the row-oriented one"""
+        self.db.log_sensor_readings_batch([
+            ('sensor1', 'Room1', 70.0, False),
+            ('sensor2', 'Room2', 68.5, True),
+        ])
+        
+        rows = self.db.get_sensor_history()
+        columns = self.db.get_sensor_history_columns()
+        
+        self.assertEqual(columns['temperature'], [r['temperature'] for r in rows])
+        self.assertEqual(columns['sensor_id'], [r['sensor_id'] for r in rows])
+        self.assertEqual(columns['timestamp'], [r['timestamp'] for r in rows])
+        self.assertTrue(columns['timestamp'][0].endswith('Z'))
+    
+    def test_get_sensor_history_columns_empty(self):
+        """Test column-oriented history with no readings"""
+        columns = self.db.get_sensor_history_columns(sensor_id='missing')
+        
+        self.assertEqual(columns['temperature'], [])
+        self.assertEqual(columns['timestamp'], [])
+    
+    def test_sensor_history_uses_current_name(self):
+        """Test that history reports a sensor's current name, not the logged one"""
+        self.db.add_sensor('sensor1', 'Room1')
+        self.db.log_sensor_reading('sensor1', 'Room1', 70.0, False)
+        self.db.log_sensor_reading('sensor2', 'Unregistered', 68.0, False)
+        self.db.get_sensor_history()  # warm the name cache
+        
+        self.db.update_sensor('sensor1', name='Living Room')
+        
+        names = {r['sensor_id']: r['sensor_name'] for r in self.db.get_sensor_history()}
+        self.assertEqual(names, {'sensor1': 'Living Room', 'sensor2': 'Unregistered'})
+        columns = self.db.get_sensor_history_columns(sensor_id='sensor1')
+        self.assertEqual(columns['sensor_name'], ['Living Room'])
+    
+    def test_iter_sensor_history(self):
+        """Test streamed history yields the same rows and returns its reader"""
+        for i in range(3):
+            self.db.log_sensor_reading('sensor1', 'Room1', 70.0 + i, False)
+        
+        readings = self.db.iter_sensor_history()
+        first = next(readings)
+        self.assertTrue(first['timestamp'].endswith('Z'))
+        readings.close()
+        
+        self.assertEqual(list(self.db.iter_sensor_history()), self.db.get_sensor_history())
+        self.assertEqual(self.db._readers.qsize(), self.db._reader_count)
 
 
 class TestDatabaseMaintenance(unittest.TestCase):
@@ -560,6 +1311,14 @@ class TestSensorCRUD(unittest.TestCase):
         self.assertTrue(sensor['enabled'])  # Default True
         self.assertFalse(sensor['monitored'])  # Default False
     
+    def test_sensor_flags_are_booleans(self):
+        """Test the stored 0/1 flags come back as booleans"""
+        self.db.add_sensor("28-000000000001", "Bedroom")
+        
+        for sensor in (self.db.get_sensor("28-000000000001"), self.db.get_sensors()[0]):
+            self.assertIs(sensor['enabled'], True)
+            self.assertIs(sensor['monitored'], False)
+    
     def test_get_sensor_not_found(self):
         """Test getting a sensor that doesn't exist"""
         sensor = self.db.get_sensor("28-nonexistent")
@@ -879,6 +1638,97 @@ class TestDatabaseMaintenance(unittest.TestCase):
         
         # Database should still exist
         self.assertTrue(os.path.exists(self.db_path))
+    
+    def test_cleanup_deletes_in_batches(self):
+        """Test cleanup keeps deleting until every old row is gone"""
+        self.db.CLEANUP_BATCH_SIZE = 3
+        old_time = (datetime.now() - timedelta(days=31)).isoformat()
+        with self.db._get_connection() as conn:
+            conn.executemany(
+                'INSERT INTO sensor_history (sensor_id, sensor_name, temperature, is_compromised, timestamp) VALUES (?, ?, ?, ?, ?)',
+                [('sensor1', 'Room1', 68.0, 0, old_time)] * 10
+            )
+        self.db.log_sensor_reading('sensor1', 'Room1', 70.0, False)
+    
+        self.db.cleanup_old_history(days_to_keep=30)
+    
+        remaining = self.db.get_sensor_history(hours=24*365)
+        self.assertEqual(len(remaining), 1)
+        self.assertEqual(remaining[0]['temperature'], 70.0)
+    
+    def test_cleanup_batches_share_transactions(self):
+        """Test that both history tables are purged in the same batch transactions"""
+        self.db.CLEANUP_BATCH_SIZE = 3
+        old_time = (datetime.now() - timedelta(days=31)).isoformat()
+        with self.db._get_connection() as conn:
+            conn.executemany(
+                'INSERT INTO sensor_history (sensor_id, sensor_name, temperature, is_compromised, timestamp) VALUES (?, ?, ?, ?, ?)',
+                [('sensor1', 'Room1', 68.0, 0, old_time)] * 7
+            )
+            conn.executemany(
+                'INSERT INTO hvac_history (hvac_mode, heat_active, timestamp) VALUES (?, ?, ?)',
+                [('heat', 1, old_time)] * 4
+            )
+            statements = []
+            conn.set_trace_callback(statements.append)
+        
+        deleted = self.db._delete_before(('sensor_history', 'hvac_history'),
+                                         datetime.now().isoformat())
+        
+        self.assertEqual(deleted, {'sensor_history': 7, 'hvac_history': 4})
+        # Rounds: 3+3, 3+1, then 1 sensor row
+        self.assertEqual(statements.count('BEGIN IMMEDIATE'), 3)
+    
+    def test_stats_counts_follow_inserts_and_deletes(self):
+        """Test that history counts stay exact through writes and cleanup"""
+        for i in range(5):
+            self.db.log_sensor_reading('sensor1', 'Room1', 70.0 + i, False)
+        self.db.log_hvac_state(20.0, 19.0, 22.0, 'heat', 'auto', True, False, False, False)
+        self.db.log_setting_change('hvac_mode', 'off', 'heat')
+        
+        stats = self.db.get_database_stats()
+        self.assertEqual(stats['sensor_history_count'], 5)
+        self.assertEqual(stats['hvac_history_count'], 1)
+        self.assertEqual(stats['setting_history_count'], 1)
+        
+        with self.db._get_connection() as conn:
+            conn.execute("UPDATE sensor_history SET timestamp = '2000-01-01 00:00:00' WHERE temperature < 72")
+        self.db.cleanup_old_history(days_to_keep=30)
+        
+        stats = self.db.get_database_stats()
+        self.assertEqual(stats['sensor_history_count'], 3)
+    
+    def test_cleanup_releases_free_pages(self):
+        """Test that cleanup hands deleted pages back to the filesystem"""
+        with self.db._get_connection() as conn:
+            self.assertEqual(conn.execute('PRAGMA auto_vacuum').fetchone()[0], 2)  # INCREMENTAL
+            conn.executemany(
+                'INSERT INTO sensor_history (sensor_id, sensor_name, temperature, is_compromised, timestamp) VALUES (?, ?, ?, ?, ?)',
+                [('sensor1', 'Room1' * 50, 68.0, 0, '2000-01-01 00:00:00')] * 2000
+            )
+        
+        self.db.cleanup_old_history(days_to_keep=30)
+        
+        with self.db._get_connection() as conn:
+            self.assertEqual(conn.execute('PRAGMA freelist_count').fetchone()[0], 0)
+    
+    def test_cleanup_releases_free_pages_in_batches(self):
+        """Test that free pages are handed back in bounded incremental_vacuum steps"""
+        with self.db._get_connection() as conn:
+            conn.executemany(
+                'INSERT INTO sensor_history (sensor_id, sensor_name, temperature, is_compromised, timestamp) VALUES (?, ?, ?, ?, ?)',
+                [('sensor1', 'Room1' * 50, 68.0, 0, '2000-01-01 00:00:00')] * 2000
+            )
+            statements = []
+            conn.set_trace_callback(statements.append)
+        
+        with patch.object(ThermostatDatabase, 'VACUUM_BATCH_PAGES', 10):
+            self.db.cleanup_old_history(days_to_keep=30)
+        
+        vacuums = [sql for sql in statements if sql.startswith('PRAGMA incremental_vacuum(10)')]
+        self.assertGreater(len(vacuums), 1)
+        with self.db._get_connection() as conn:
+            self.assertEqual(conn.execute('PRAGMA freelist_count').fetchone()[0], 0)
 
 
 class TestSettingsEdgeCases(unittest.TestCase):
@@ -1028,6 +1878,34 @@ class TestSmartCleanupEdgeCases(unittest.TestCase):
         
         # Should return without error
         self.db.smart_cleanup(min_days_to_keep=30, max_disk_percent=50)
+    
+    def _vacuums_over_limit(self, db):
+        """Run an over-limit smart cleanup and return the VACUUMs it issued"""
+        statements = []
+        with db._get_connection() as conn:
+            conn.set_trace_callback(statements.append)
+        # A one-byte disk keeps the database over any limit
+        with patch('shutil.disk_usage') as disk_usage:
+            disk_usage.return_value.total = 1
+            db.smart_cleanup(min_days_to_keep=30, max_disk_percent=50)
+        return [sql for sql in statements if sql.strip().upper() == 'VACUUM']
+    
+    def test_smart_cleanup_skips_vacuum_when_incremental(self):
+        """Test that over-limit passes rely on incremental vacuum"""
+        self.assertEqual(self._vacuums_over_limit(self.db), [])
+    
+    def test_smart_cleanup_vacuums_legacy_database_once(self):
+        """Test that a database without auto_vacuum is vacuumed and switched over"""
+        legacy_path = self.temp_file.name + '.legacy'
+        self.addCleanup(lambda: [os.unlink(legacy_path + suffix) for suffix in ('', '-wal', '-shm')
+                                 if os.path.exists(legacy_path + suffix)])
+        sqlite3.connect(legacy_path).execute('CREATE TABLE placeholder (x)').connection.close()
+        db = ThermostatDatabase(legacy_path)
+        
+        self.assertEqual(len(self._vacuums_over_limit(db)), 1)
+        with db._get_connection() as conn:
+            self.assertEqual(conn.execute('PRAGMA auto_vacuum').fetchone()[0], 2)
+        db.close()
 
 
 if __name__ == '__main__':
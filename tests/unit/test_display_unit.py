@@ -18,6 +18,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
 sys.modules['waveshare_epd'] = MagicMock()
 sys.modules['waveshare_epd.epd2in13_V2'] = MagicMock()
 
+import display
 from display import ThermostatDisplay
 
 
@@ -34,6 +35,20 @@ class TestThermostatDisplay(unittest.TestCase):
         self.assertEqual(self.display.width, 250)
         self.assertEqual(self.display.height, 122)
     
+    def test_fonts_shared_between_instances(self):
+        """Test that fonts are loaded once and reused by later displays"""
+        with patch('display.DISPLAY_AVAILABLE', False):
+            other = ThermostatDisplay()
+        
+        self.assertIs(other.font_large, self.display.font_large)
+        self.assertIs(other.font_tiny, self.display.font_tiny)
+    
+    def test_missing_font_falls_back_to_default(self):
+        """Test that an unreadable font file falls back to the default font"""
+        font = display._load_font('/nonexistent/font.ttf', 12)
+        
+        self.assertIsNotNone(font)
+    
     def test_create_display_image_basic(self):
         """Test creating a basic display image"""
         hvac_state = {'heat': True, 'cool': False, 'fan': True, 'heat2': False}
@@ -111,6 +126,18 @@ class TestThermostatDisplay(unittest.TestCase):
             )
             self.assertIsNotNone(image)
     
+    def test_hvac_status_text(self):
+        """Test the HVAC status line for each combination of outputs"""
+        from itertools import product
+        
+        for heat, cool, fan, heat2 in product((False, True), repeat=4):
+            hvac_state = {'heat': heat, 'cool': cool, 'fan': fan, 'heat2': heat2}
+            expected = "+".join(name for name, on in
+                                (("HEAT", heat), ("COOL", cool), ("FAN", fan), ("HEAT2", heat2))
+                                if on) or "OFF"
+            texts = self.display._layout(20.0, 19.0, hvac_state, [], [], datetime.now())
+            self.assertIn(((self.display._hvac_x, 60), expected, self.display.font_medium), texts)
+    
     def test_create_display_image_truncates_long_sensor_names(self):
         """Test long sensor names are truncated"""
         from thermostat import SensorReading
@@ -154,6 +181,93 @@ class TestThermostatDisplay(unittest.TestCase):
         
         self.assertIsNotNone(image)
     
+    def test_sensor_lines_drawn_at_line_height(self):
+        """Test the sensor block matches lines drawn one at a time"""
+        from PIL import ImageDraw
+        from thermostat import SensorReading
+        
+        sensor_readings = [
+            SensorReading(f's{i}', f'Room{i}', 20.0 + i, datetime.now())
+            for i in range(3)
+        ]
+        texts = self.display._layout(21.0, 20.0, {}, sensor_readings, ['s1'], datetime.now())
+        image = self.display._render(texts).copy()
+        
+        expected = self.display._render([t for t in texts if '\n' not in t[1]])
+        draw = ImageDraw.Draw(expected)
+        for i, line in enumerate([" Room0: 68.0°F", "!Room1: 69.8°F", " Room2: 71.6°F"]):
+            y_pos = 90 + i * self.display.SENSOR_LINE_HEIGHT
+            draw.text((10, y_pos), line, font=self.display.font_tiny, fill=0)
+        
+        self.assertEqual(image.tobytes(), expected.tobytes())
+    
+    def test_compromised_sensors_accepts_sets(self):
+        """Test compromised sensors can be given as a list, set or dict keys"""
+        from thermostat import SensorReading
+        
+        sensor_readings = [
+            SensorReading('s1', 'Living Room', 21.0, datetime.now()),
+            SensorReading('s2', 'Bedroom', 20.0, datetime.now()),
+        ]
+        now = datetime.now()
+        expected = self.display._layout(21.0, 20.0, {}, sensor_readings, ['s2'], now)
+        
+        for compromised in ({'s2'}, frozenset(['s2']), {'s2': now}.keys()):
+            texts = self.display._layout(21.0, 20.0, {}, sensor_readings, compromised, now)
+            self.assertEqual(texts, expected)
+        self.assertIn("!Bedroom", expected[-2][1])
+    
+    def test_clock_drawn_inside_frame(self):
+        """Test the clock is laid out within the portrait frame"""
+        from PIL import ImageDraw
+        
+        texts = self.display._layout(20.0, 19.0, {}, [], [], datetime(2024, 12, 31, 23, 59))
+        position, text, font = texts[-1]
+        self.assertEqual(text, "12/31 23:59")
+        
+        image = self.display.create_display_image(20.0, 19.0, {}, [], [])
+        left, top, right, bottom = ImageDraw.Draw(image).textbbox(position, text, font=font)
+        self.assertTrue(0 <= left and right <= image.width)
+        self.assertTrue(0 <= top and bottom <= image.height)
+    
+    def test_instance_attributes_are_slotted(self):
+        """Test that display instances have no per-instance __dict__"""
+        self.assertFalse(hasattr(self.display, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.display.unknown_attribute = True
+    
+    def test_background_not_modified_by_frames(self):
+        """Test that drawing a frame leaves the shared background untouched"""
+        background = self.display._background.tobytes()
+        hvac_state = {'heat': True, 'cool': False, 'fan': True, 'heat2': False}
+        
+        image = self.display.create_display_image(70.0, 68.0, hvac_state, [], [])
+        
+        self.assertEqual(self.display._background.tobytes(), background)
+        self.assertNotEqual(image.tobytes(), background)
+    
+    def test_unit_label_background_cached_per_unit(self):
+        """Test the unit label is drawn once per unit and follows unit changes"""
+        fahrenheit = self.display.create_display_image(20.0, 19.0, {}, [], [])
+        self.display.create_display_image(21.0, 19.0, {}, [], [])
+        self.assertEqual(list(self.display._unit_backgrounds), ['°F'])
+        
+        self.display.temperature_units = 'C'
+        celsius = self.display.create_display_image(20.0, 19.0, {}, [], [])
+        self.assertEqual(list(self.display._unit_backgrounds), ['°F', '°C'])
+        self.assertNotEqual(celsius.tobytes(), fahrenheit.tobytes())
+    
+    def test_display_images_are_independent(self):
+        """Test that images returned for earlier frames are not redrawn"""
+        hvac_state = {'heat': True, 'cool': False, 'fan': False, 'heat2': False}
+        
+        first = self.display.create_display_image(20.0, 19.0, hvac_state, [], [])
+        pixels = first.tobytes()
+        second = self.display.create_display_image(25.0, 19.0, {}, [], [])
+        
+        self.assertEqual(first.tobytes(), pixels)
+        self.assertNotEqual(second.tobytes(), pixels)
+    
     def test_update_without_display(self):
         """Test update gracefully handles missing display"""
         hvac_state = {'heat': True, 'cool': False, 'fan': True, 'heat2': False}
@@ -247,6 +361,103 @@ class TestThermostatDisplay(unittest.TestCase):
             
             mock_epd.sleep.assert_called_once()
     
+    def test_update_skips_unchanged_frame(self):
+        """Test that an identical frame is not redrawn or sent to the panel"""
+        mock_epd = MagicMock()
+        display = ThermostatDisplay()
+        display.epd = mock_epd
+        hvac_state = {'heat': True, 'cool': False, 'fan': True, 'heat2': False}
+        
+        refreshes = lambda: mock_epd.display.call_count + mock_epd.displayPartial.call_count
+        
+        with patch('display.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime(2024, 1, 1, 12, 0)
+            self.assertTrue(display.update(20.0, 19.0, hvac_state))
+            self.assertTrue(display.update(20.0, 19.0, hvac_state))
+            self.assertEqual(refreshes(), 1)
+            
+            display.update(21.0, 19.0, hvac_state)
+            self.assertEqual(refreshes(), 2)
+            
+            # The clock changing is a new frame
+            mock_datetime.now.return_value = datetime(2024, 1, 1, 12, 1)
+            display.update(21.0, 19.0, hvac_state)
+            self.assertEqual(refreshes(), 3)
+    
+    def test_update_skips_layout_for_repeated_arguments(self):
+        """Test that repeated calls within a minute don't lay out a new frame"""
+        from thermostat import SensorReading
+        
+        mock_epd = MagicMock()
+        mock_db = MagicMock()
+        mock_db.load_settings.return_value = {'temperature_units': 'F'}
+        display = ThermostatDisplay(database=mock_db)
+        display.epd = mock_epd
+        hvac_state = {'heat': True, 'cool': False, 'fan': True, 'heat2': False}
+        readings = [SensorReading('s1', 'Living Room', 21.0, datetime.now())]
+        
+        with patch('display.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime(2024, 1, 1, 12, 0, 5)
+            display.update(20.0, 19.0, hvac_state, readings, ['s1'])
+            mock_datetime.now.return_value = datetime(2024, 1, 1, 12, 0, 50)
+            self.assertTrue(display.update(20.0, 19.0, dict(hvac_state), list(readings), {'s1'}))
+            self.assertEqual(mock_db.load_settings.call_count, 1)
+            
+            # A changed argument or a new minute lays out the frame again
+            display.update(20.0, 19.0, hvac_state, readings, [])
+            self.assertEqual(mock_db.load_settings.call_count, 2)
+            mock_datetime.now.return_value = datetime(2024, 1, 1, 12, 1, 0)
+            display.update(20.0, 19.0, hvac_state, readings, [])
+            self.assertEqual(mock_db.load_settings.call_count, 3)
+        
+        self.assertEqual(mock_epd.display.call_count + mock_epd.displayPartial.call_count, 3)
+    
+    @patch.object(ThermostatDisplay, 'PARTIAL_UPDATES_PER_FULL', 2)
+    def test_update_uses_partial_refresh_between_full_refreshes(self):
+        """Test that frames use partial refresh, with a periodic full refresh"""
+        mock_epd = MagicMock()
+        display = ThermostatDisplay()
+        display.epd = mock_epd
+        hvac_state = {'heat': False, 'cool': False, 'fan': False, 'heat2': False}
+        
+        for temp in (20.0, 20.5, 21.0, 21.5):
+            display.update(temp, 19.0, hvac_state)
+        
+        # full, partial, partial, full
+        self.assertEqual(mock_epd.display.call_count, 2)
+        self.assertEqual(mock_epd.displayPartial.call_count, 2)
+        mock_epd.init.assert_any_call(mock_epd.PART_UPDATE)
+    
+    def test_update_after_sleep_is_full_refresh(self):
+        """Test that the first frame after sleep or clear is a full refresh"""
+        mock_epd = MagicMock()
+        display = ThermostatDisplay()
+        display.epd = mock_epd
+        hvac_state = {'heat': False, 'cool': False, 'fan': False, 'heat2': False}
+        
+        display.update(20.0, 19.0, hvac_state)
+        display.sleep()
+        display.update(20.5, 19.0, hvac_state)
+        display.clear()
+        display.update(20.5, 19.0, hvac_state)
+        
+        self.assertEqual(mock_epd.display.call_count, 3)
+        mock_epd.displayPartial.assert_not_called()
+    
+    def test_update_retries_after_display_error(self):
+        """Test that a frame which failed to display is sent again"""
+        mock_epd = MagicMock()
+        mock_epd.display.side_effect = [Exception("Display error"), None]
+        display = ThermostatDisplay()
+        display.epd = mock_epd
+        hvac_state = {'heat': False, 'cool': False, 'fan': False, 'heat2': False}
+        
+        with patch('display.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime(2024, 1, 1, 12, 0)
+            self.assertFalse(display.update(20.0, 19.0, hvac_state))
+            self.assertTrue(display.update(20.0, 19.0, hvac_state))
+        self.assertEqual(mock_epd.display.call_count, 2)
+    
     def test_update_handles_display_error(self):
         """Test update handles display errors gracefully"""
         mock_epd = MagicMock()
@@ -206,6 +206,11 @@ class TestScheduleSystem(unittest.TestCase):
         self.assertEqual(self.controller.target_temp_heat, 70.0)
         self.assertEqual(self.controller.target_temp_cool, 76.0)
         self.assertEqual(self.controller.hvac_mode, 'auto')
+        
+        # Verify each change was recorded in the audit trail
+        history = self.controller.db.get_setting_history()
+        self.assertEqual(len(history), 3)
+        self.assertTrue(all(h['source'] == 'schedule:Test Schedule' for h in history))
 
 
 class TestHistoryLogging(unittest.TestCase):
@@ -18,6 +18,7 @@ from temperature_utils import (
     fahrenheit_to_kelvin,
     kelvin_to_fahrenheit,
     convert_temperature,
+    convert_temperatures,
     get_unit_symbol,
     format_temperature
 )
@@ -64,6 +65,15 @@ class TestTemperatureConversion(unittest.TestCase):
         self.assertAlmostEqual(kelvin_to_fahrenheit(273.15), 32, places=1)
         self.assertAlmostEqual(kelvin_to_fahrenheit(373.15), 212, places=1)
     
+    def test_fahrenheit_kelvin_match_two_step_conversion(self):
+        """Test direct Fahrenheit/Kelvin conversions agree with going via Celsius"""
+        for fahrenheit in (-40, 0, 32, 68.5, 98.6, 212):
+            self.assertAlmostEqual(fahrenheit_to_kelvin(fahrenheit),
+                                   celsius_to_kelvin(fahrenheit_to_celsius(fahrenheit)), places=9)
+        for kelvin in (0, 233.15, 273.15, 295.5, 373.15):
+            self.assertAlmostEqual(kelvin_to_fahrenheit(kelvin),
+                                   celsius_to_fahrenheit(kelvin_to_celsius(kelvin)), places=9)
+    
     def test_round_trip_conversion(self):
         """Test converting back and forth preserves value"""
         original_c = 22.5
@@ -118,6 +128,25 @@ class TestUniversalConversion(unittest.TestCase):
         with self.assertRaises(ValueError) as cm:
             convert_temperature(20, 'C', 'X')
         self.assertIn('Unsupported', str(cm.exception))
+    
+    def test_convert_temperatures_matches_single_conversion(self):
+        """Test bulk conversion gives the same values as one at a time"""
+        temps = [-40.0, 0.0, 21.5, 100.0]
+        for from_unit in 'CFK':
+            for to_unit in 'CFK':
+                self.assertEqual(
+                    convert_temperatures(temps, from_unit, to_unit),
+                    [convert_temperature(t, from_unit, to_unit) for t in temps]
+                )
+    
+    def test_convert_temperatures_keeps_none(self):
+        """Test bulk conversion passes missing values through"""
+        self.assertEqual(convert_temperatures([None, 0.0], 'c', 'f'), [None, 32.0])
+    
+    def test_convert_temperatures_invalid_unit(self):
+        """Test bulk conversion rejects unknown units even with no values"""
+        with self.assertRaises(ValueError):
+            convert_temperatures([], 'C', 'X')
 
 
 class TestFormatting(unittest.TestCase):
@@ -6,7 +6,9 @@ Tests core logic without hardware dependencies
 
 import os
 import sys
+import time
 import unittest
+from collections import deque
 from datetime import datetime, timedelta
 from unittest.mock import Mock, patch, MagicMock
 
@@ -40,6 +42,13 @@ class TestSensorReading(unittest.TestCase):
         reading = SensorReading('test-id', 'Test', 70.0, datetime.now())
         reading.is_compromised = True
         self.assertTrue(reading.is_compromised)
+    
+    def test_sensor_reading_is_slotted(self):
+        """Test readings don't carry a per-instance __dict__"""
+        reading = SensorReading('test-id', 'Test', 70.0, datetime.now())
+        self.assertFalse(hasattr(reading, '__dict__'))
+        with self.assertRaises(AttributeError):
+            reading.unexpected = True
 
 
 class TestThermostatController(unittest.TestCase):
@@ -201,6 +210,42 @@ class TestThermostatController(unittest.TestCase):
         self.assertIn('sensor1', self.controller.compromised_sensors)
         self.assertNotIn('sensor2', self.controller.compromised_sensors)
     
+    def test_detect_anomalies_returns_valid_temps(self):
+        """Test the returned temperatures exclude sensors marked in the pass"""
+        self.controller.monitored_sensors = ['sensor1', 'sensor2']
+        now = datetime.now()
+        readings = [
+            SensorReading('sensor1', 'Living Room', 28.0, now),  # Very hot!
+            SensorReading('sensor2', 'Bedroom', 21.0, now),
+        ]
+        
+        valid_temps = self.controller.detect_anomalies(readings, now)
+        
+        self.assertEqual(valid_temps, [21.0])
+        self.assertEqual(self.controller.calculate_system_temperature(readings, now, valid_temps),
+                         self.controller.calculate_system_temperature(readings, now))
+        self.assertIsNone(self.controller.detect_anomalies(readings[:1], now))
+    
+    def test_detect_anomalies_follows_monitored_sensor_changes(self):
+        """Test reassigning monitored sensors changes which are checked"""
+        readings = [
+            SensorReading('sensor1', 'Living Room', 28.0, datetime.now()),  # Very hot!
+            SensorReading('sensor2', 'Bedroom', 21.0, datetime.now()),
+        ]
+        
+        self.controller.monitored_sensors = ['sensor2']
+        self.controller.detect_anomalies(readings)
+        self.assertNotIn('sensor1', self.controller.compromised_sensors)
+        
+        self.controller.monitored_sensors = ['sensor1', 'sensor2']
+        self.controller.detect_anomalies(readings)
+        self.assertIn('sensor1', self.controller.compromised_sensors)
+        self.assertEqual(self.controller.monitored_sensors, ('sensor1', 'sensor2'))
+        
+        # Only reassignment changes it, so the lookup set can't fall behind
+        with self.assertRaises(AttributeError):
+            self.controller.monitored_sensors.append('sensor3')
+    
     def test_detect_anomalies_clears_expired(self):
         """Test expired compromised sensors are cleared"""
         sensor_id = 'test-sensor'
@@ -219,6 +264,52 @@ class TestThermostatController(unittest.TestCase):
         # Should be cleared
         self.assertNotIn(sensor_id, self.controller.compromised_sensors)
     
+    def test_detect_anomalies_reads_clock_once(self):
+        """Test one anomaly pass uses a single current time for every sensor"""
+        now = datetime.now()
+        for sensor_id in ('sensor1', 'sensor2'):
+            self.controller.sensor_history[sensor_id] = deque([
+                SensorReading(sensor_id, 'Room', 21.0, now - timedelta(minutes=m))
+                for m in (10, 6, 1)
+            ])
+        self.controller.compromised_sensors['sensor3'] = now + timedelta(hours=1)
+        readings = [
+            SensorReading('sensor1', 'Living Room', 21.0, now),
+            SensorReading('sensor2', 'Bedroom', 21.2, now),
+            SensorReading('sensor3', 'Den', 21.1, now),
+        ]
+        
+        with patch('thermostat.datetime') as mock_datetime:
+            mock_datetime.now.return_value = now
+            self.controller.detect_anomalies(readings)
+        
+        self.assertEqual(mock_datetime.now.call_count, 1)
+        self.assertEqual(list(self.controller.compromised_sensors), ['sensor3'])
+    
+    def test_reading_processing_uses_given_time(self):
+        """Test the per-tick sensor processing uses the caller's time"""
+        now = datetime.now()
+        readings = [
+            SensorReading('sensor1', 'Living Room', 28.0, now),  # Very hot!
+            SensorReading('sensor2', 'Bedroom', 21.0, now),
+        ]
+        
+        with patch('thermostat.datetime') as mock_datetime:
+            self.controller.update_sensor_history(readings, now)
+            self.controller.detect_anomalies(readings, now)
+            self.controller.calculate_system_temperature(readings, now)
+        
+        mock_datetime.now.assert_not_called()
+        self.assertEqual(self.controller.compromised_sensors['sensor1'],
+                         now + timedelta(seconds=self.controller.ignore_duration))
+    
+    def test_loop_timers_use_monotonic_clock(self):
+        """Test the control loop timers don't follow the wall clock"""
+        self.assertIsInstance(self.controller.last_schedule_check, float)
+        self.assertIsInstance(self.controller.last_history_log, float)
+        self.assertIsInstance(self.controller.last_cleanup, float)
+        self.assertLessEqual(self.controller.last_cleanup, time.monotonic())
+    
     def test_hvac_state_safety_heat_and_cool(self):
         """Test safety: never activate heat and cool simultaneously"""
         with patch('thermostat.GPIO'):
@@ -234,6 +325,30 @@ class TestThermostatController(unittest.TestCase):
             self.assertFalse(len(self.controller.active_heat_stages) > 0)
             self.assertTrue(self.controller.hvac_state['cool'])  # Cool should still be on
     
+    def test_update_stages_holding_state_skips_work(self):
+        """Test an unchanged stage request doesn't touch the clock or GPIO"""
+        self.controller.active_heat_stages = [1]
+        self.controller.hvac_state['fan'] = True
+        
+        with patch('thermostat.GPIO') as mock_gpio, patch('thermostat.datetime') as mock_datetime:
+            self.controller._update_stages('heat', [1], True)
+        
+        mock_datetime.now.assert_not_called()
+        mock_gpio.output.assert_not_called()
+        self.assertTrue(self.controller.hvac_state['heat'])
+        self.assertTrue(self.controller.hvac_state['fan'])
+    
+    def test_update_stages_only_writes_changed_pins(self):
+        """Test a stage change leaves the fan relay alone when it stays on"""
+        self.controller.heating_stages = [{'stage_number': 1, 'gpio_pin': 17, 'min_run_time': 300}]
+        self.controller.hvac_state['fan'] = True
+        
+        with patch('thermostat.GPIO') as mock_gpio:
+            self.controller._update_stages('heat', [1], True)
+        
+        mock_gpio.output.assert_called_once_with(17, mock_gpio.HIGH)
+        self.assertEqual(self.controller.active_heat_stages, [1])
+    
     def test_control_hvac_heating_mode_below_target(self):
         """Test HVAC activates heating when below target"""
         self.controller.hvac_mode = 'heat'
@@ -330,6 +445,15 @@ class TestThermostatController(unittest.TestCase):
         self.assertFalse(self.controller.hvac_state['cool'])
         self.assertFalse(self.controller.hvac_state['fan'])
     
+    def test_history_flush_interval_from_config(self):
+        """Test HISTORY_FLUSH_INTERVAL sets how long history is buffered"""
+        with patch.dict(os.environ, {'HISTORY_FLUSH_INTERVAL': '900'}), \
+             patch('thermostat.GPIO', None):
+            controller = ThermostatController()
+        
+        self.assertEqual(controller.db.WRITE_FLUSH_INTERVAL, 900.0)
+        controller.db.close()
+    
     def test_update_sensor_history(self):
         """Test sensor history is updated and pruned"""
         now = datetime.now()
@@ -352,7 +476,7 @@ class TestThermostatController(unittest.TestCase):
         # Add old reading (>30 minutes ago)
         old_time = datetime.now() - timedelta(minutes=35)
         old_reading = SensorReading(sensor_id, 'Room', 18.0, old_time)
-        self.controller.sensor_history[sensor_id] = [old_reading]
+        self.controller.sensor_history[sensor_id] = deque([old_reading])
         
         # Add new reading
         new_reading = SensorReading(sensor_id, 'Room', 21.0, datetime.now())
@@ -362,6 +486,20 @@ class TestThermostatController(unittest.TestCase):
         self.assertEqual(len(self.controller.sensor_history[sensor_id]), 1)
         self.assertEqual(self.controller.sensor_history[sensor_id][0].temperature, 21.0)
     
+    def test_update_sensor_history_bounded_length(self):
+        """Test history keeps at most 30 minutes' worth of readings per sensor"""
+        now = datetime.now()
+        for _ in range(200):
+            self.controller.update_sensor_history([SensorReading('s1', 'Room1', 21.0, now)])
+        
+        # 30 minutes at the 30 second read interval, plus a small margin
+        self.assertEqual(len(self.controller.sensor_history['s1']), 64)
+        
+        # A reading already older than the window is not kept
+        old = SensorReading('s2', 'Room2', 20.0, now - timedelta(minutes=45))
+        self.controller.update_sensor_history([old])
+        self.assertEqual(len(self.controller.sensor_history['s2']), 0)
+    
     def test_get_status(self):
         """Test get_status returns correct information"""
         self.controller.hvac_state['heat'] = True
@@ -419,6 +419,15 @@ class TestHistoryEndpoints(unittest.TestCase):
         data = json.loads(response.data)
         self.assertGreater(len(data), 0)
     
+    def test_get_hvac_history_converts_temperatures(self):
+        """Test HVAC history temperatures are converted to the display units"""
+        response = self.client.get('/api/history/hvac?hours=24')
+        
+        entry = json.loads(response.data)['history'][0]
+        self.assertAlmostEqual(entry['system_temp'], 161.6, places=1)
+        self.assertAlmostEqual(entry['target_temp_heat'], 154.4, places=1)
+        self.assertAlmostEqual(entry['target_temp_cool'], 167.0, places=1)
+    
     def test_get_settings_history(self):
         """Test getting settings history"""
         response = self.client.get('/api/history/settings?limit=100')
@@ -553,6 +562,11 @@ class TestAPIEndpoints(unittest.TestCase):
         data = json.loads(response.data)
         self.assertIn('sensors', data)
         self.assertEqual(len(data['sensors']), 2)
+        
+        # Flags are JSON booleans, not the 0/1 the database stores
+        living_room = next(s for s in data['sensors'] if s['sensor_id'] == '28-0001')
+        self.assertIs(living_room['enabled'], True)
+        self.assertIs(living_room['monitored'], True)
     
     def test_sensors_list_without_database(self):
         """Test sensors list without database"""